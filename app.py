@@ -1,46 +1,123 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from flask import Flask, render_template, get_template_attribute, request, redirect, url_for, flash, session, jsonify, make_response, g, Response, stream_with_context, send_from_directory
+from sqlalchemy.exc import IntegrityError
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_mail import Mail, Message
-from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import FileSystemBytecodeCache
+import click
+from werkzeug.security import generate_password_hash
+from werkzeug.datastructures import MultiDict
+from werkzeug.utils import safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
-import requests
-from bs4 import BeautifulSoup
 import os
+import csv
+import io
+import gzip
+import json
+import zlib
+import hashlib
+import math
+import mimetypes
 from dotenv import load_dotenv
+import re
 import secrets
 import string
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import wraps
+from types import SimpleNamespace
+from models import (
+    db, pool_metrics, configure_database, generate_uid, REPLICA_BIND_KEYS,
+    USER_SEARCH_LIMIT, index_user_search, search_users, user_search_filter,
+    User, Domain, RegisteredEmail, VerificationToken, EmailOutbox, Announcement, SiteSettings,
+    PrefixBlacklist, AllowedEmailSuffix, Ticket, TicketReply, AboutPage, UserAgreement,
+    RedemptionCode, CacheVersion, RateLimitBucket, UserSearchGram
+)
 
 load_dotenv()
 
 # 系统版本号
 SYSTEM_VERSION = '1.4.0'
 
+# 进程内缓存版本检查间隔（秒）
+CACHE_VERSION_CHECK_INTERVAL = float(os.getenv('CACHE_VERSION_CHECK_INTERVAL', '5'))
+
+# 公共页面（首页/关于/用户协议）浏览器与反向代理缓存时间（秒）
+PUBLIC_PAGE_MAX_AGE = int(os.getenv('PUBLIC_PAGE_MAX_AGE', '60'))
+
+# Jinja 模板字节码缓存目录，默认 instance/jinja_cache；worker 重启或新部署时直接加载编译结果，设为 none 关闭
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', '')
+
+# 用户中心缓存片段（邮箱列表和弹窗）在每个进程中最多占用的内存（MB），0 表示关闭
+FRAGMENT_CACHE_MB = float(os.getenv('FRAGMENT_CACHE_MB', '64'))
+
+# build_assets.py 生成的带哈希静态资源缓存时间（秒），文件名随内容变化，可以长期缓存
+ASSET_MAX_AGE = 31536000
+# 未构建静态资源时是否允许页面回退到 CDN；关闭时 gunicorn 启动预热会因缺少构建产物而失败
+ASSET_CDN_FALLBACK = os.getenv('ASSET_CDN_FALLBACK', 'false').lower() == 'true'
+
+# 后台列表分页
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+TICKET_PAGE_SIZE = 20
+TICKET_REPLY_PAGE_SIZE = 20
+
+# 批量生成卡密
+CODE_BATCH_SIZE = 1000
+CODE_BULK_MAX = 100000
+CODE_PREVIEW_LIMIT = 100
+
+# 请求频率限制：RATE_LIMIT_BACKEND 可选 memory（进程内）/ database（多实例共享）/ none
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+
+# 站点前的可信反向代理层数，大于 0 时按 X-Forwarded-For / X-Forwarded-Proto / X-Forwarded-Host 还原客户端 IP 和地址
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(24))
-
-# 数据库配置
-db_host = os.getenv('DB_HOST', 'localhost')
-db_port = os.getenv('DB_PORT', '3306')
-db_user = os.getenv('DB_USER', 'root')
-db_password = os.getenv('DB_PASSWORD', '')
-db_name = os.getenv('DB_NAME', 'email_registration')
-app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# 邮件配置
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
-mail = Mail(app)
+
+
+def read_replica(f):
+    """标记只读路由：GET/HEAD 请求的查询可由只读副本处理。"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.read_replica = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+@app.after_request
+def remember_db_write(response):
+    if REPLICA_BIND_KEYS and g.get('db_wrote'):
+        session['db_write_at'] = time.time()
+    return response
+
+
+mail = Mail()
+
+# 邮件发件箱：OUTBOX_SENDER=thread 时每个进程在后台线程发送，none 则交给 flask send-outbox 独立进程
+OUTBOX_SENDER = os.getenv('OUTBOX_SENDER', 'thread').lower()
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_RETRY_BASE = 30
+OUTBOX_RETRY_MAX = 3600
+# 领取一批邮件后的租约时长（秒），租约过期后其他发送进程可以重新领取
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+# 单封邮件的 SMTP 超时（秒）；每批领取的数量不超过租约内按此超时能发完的数量
+OUTBOX_SEND_TIMEOUT = int(os.getenv('OUTBOX_SEND_TIMEOUT', '30'))
+if OUTBOX_LEASE_SECONDS < 2 * OUTBOX_SEND_TIMEOUT:
+    # 租约至少要容纳一封邮件发送超时再留出余量，否则邮件可能在发送途中被其他进程重新领取而重复发送
+    raise RuntimeError(f'OUTBOX_LEASE_SECONDS（{OUTBOX_LEASE_SECONDS}）至少应为 OUTBOX_SEND_TIMEOUT'
+                       f'（{OUTBOX_SEND_TIMEOUT}）的两倍')
+# SMTP 连接空闲超过该时间（秒）后关闭
+OUTBOX_IDLE_CLOSE = 60
 
 # Flask-Login配置
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = '请先登录'
 
@@ -54,6 +131,12 @@ RECAPTCHA_SITE_KEY = os.getenv('RECAPTCHA_SITE_KEY')
 RECAPTCHA_SECRET_KEY = os.getenv('RECAPTCHA_SECRET_KEY')
 RECAPTCHA_USE_CN = os.getenv('RECAPTCHA_USE_CN', 'true').lower() == 'true'
 RECAPTCHA_ENABLED = os.getenv('RECAPTCHA_ENABLED', 'true').lower() == 'true'
+# 校验超时上限与下限（秒），实际超时按近期延迟自适应
+RECAPTCHA_TIMEOUT = float(os.getenv('RECAPTCHA_TIMEOUT', '3'))
+RECAPTCHA_MIN_TIMEOUT = float(os.getenv('RECAPTCHA_MIN_TIMEOUT', '0.8'))
+RECAPTCHA_POOL_SIZE = int(os.getenv('RECAPTCHA_POOL_SIZE', '10'))
+# 校验服务不可用时放行的路由（端点名，逗号分隔），其余路由拒绝
+RECAPTCHA_FAIL_OPEN = {e.strip() for e in os.getenv('RECAPTCHA_FAIL_OPEN', '').split(',') if e.strip()}
 
 # NodeLoc OAuth 配置
 NODELOC_URL = os.getenv('NODELOC_URL', 'https://www.nodeloc.com')
@@ -79,26 +162,133 @@ if RECAPTCHA_USE_CN:
 else:
     RECAPTCHA_API_URL = 'https://www.google.com/recaptcha/api.js'
     RECAPTCHA_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
+# 校验接口地址可覆盖，用于自建代理或本地替身服务
+RECAPTCHA_VERIFY_URL = os.getenv('RECAPTCHA_VERIFY_URL') or RECAPTCHA_VERIFY_URL
+
+
+class RecaptchaCheck:
+    """一次进行中的人机验证，passed() 等待结果。"""
+
+    def __init__(self, verifier=None, future=None, endpoint=None, deadline=None, result=None):
+        self.verifier = verifier
+        self.future = future
+        self.endpoint = endpoint
+        self.deadline = deadline
+        self.result = result
+
+    def passed(self):
+        if self.result is None:
+            self.result = self.verifier.finish(self)
+        return self.result
+
+    def rejected(self):
+        """无需等待校验即可判定失败（如缺少令牌）。"""
+        return self.result is False
+
+
+class RecaptchaVerifier:
+    """reCAPTCHA 校验服务：复用 HTTPS 连接池，在后台线程中校验，按近期延迟自适应超时并统计指标。"""
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self._session = None
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='recaptcha')
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=200)
+        self.counts = Counter()
+
+    @property
+    def session(self):
+        # 首次校验时才导入 requests 并建立连接池
+        if self._session is None:
+            import requests
+            http = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            http.mount('https://', adapter)
+            http.mount('http://', adapter)
+            self._session = http
+        return self._session
+
+    def timeout(self):
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < 20:
+            return RECAPTCHA_TIMEOUT
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        return min(RECAPTCHA_TIMEOUT, max(RECAPTCHA_MIN_TIMEOUT, p95 * 3))
+
+    def start(self, response_token):
+        if not RECAPTCHA_ENABLED or not RECAPTCHA_SECRET_KEY or not RECAPTCHA_SITE_KEY:
+            return RecaptchaCheck(result=True)
+        if not response_token:
+            self._count('missing')
+            return RecaptchaCheck(result=False)
+        data = {
+            'secret': RECAPTCHA_SECRET_KEY,
+            'response': response_token,
+            'remoteip': request.remote_addr
+        }
+        timeout = self.timeout()
+        future = self.executor.submit(self._verify, data, timeout)
+        return RecaptchaCheck(self, future, request.endpoint, time.perf_counter() + timeout)
 
+    def _verify(self, data, timeout):
+        start = time.perf_counter()
+        try:
+            r = self.session.post(RECAPTCHA_VERIFY_URL, data=data, timeout=timeout)
+            r.raise_for_status()
+            return bool(r.json().get('success', False))
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+    def finish(self, check):
+        import requests
+        try:
+            success = check.future.result(timeout=max(0.0, check.deadline - time.perf_counter()) + 0.05)
+        except (FutureTimeoutError, requests.Timeout):
+            outcome = 'timeout'
+        except Exception:
+            outcome = 'error'
+        else:
+            self._count('passed' if success else 'rejected')
+            return success
+        fail_open = check.endpoint in RECAPTCHA_FAIL_OPEN
+        self._count(outcome)
+        if fail_open:
+            self._count('fail_open')
+        return fail_open
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self.latencies)
+            counts = dict(self.counts)
+
+        def percentile(q):
+            return samples[max(0, int(len(samples) * q) - 1)] if samples else 0.0
+
+        return {
+            'counts': counts,
+            'samples': len(samples),
+            'latency_avg': sum(samples) / len(samples) if samples else 0.0,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'latency_max': samples[-1] if samples else 0.0,
+            'timeout': self.timeout(),
+            'fail_open_routes': sorted(RECAPTCHA_FAIL_OPEN)
+        }
 
-def verify_recaptcha(response_token):
-    if not RECAPTCHA_ENABLED:
-        return True
-    
-    if not RECAPTCHA_SECRET_KEY or not RECAPTCHA_SITE_KEY:
-        return True
-    
-    data = {
-        'secret': RECAPTCHA_SECRET_KEY,
-        'response': response_token,
-        'remoteip': request.remote_addr
-    }
-    try:
-        r = requests.post(RECAPTCHA_VERIFY_URL, data=data, timeout=10)
-        result = r.json()
-        return result.get('success', False)
-    except:
-        return False
+
+recaptcha_verifier = RecaptchaVerifier(RECAPTCHA_POOL_SIZE)
+
+
+def start_recaptcha(response_token):
+    """在后台开始校验，调用方可同时处理数据库查询，需要结果时调用 passed()。"""
+    return recaptcha_verifier.start(response_token)
 
 
 def validate_password(password):
@@ -119,226 +309,480 @@ def validate_password(password):
     return errors
 
 
-def generate_uid():
-    return ''.join(secrets.choice(string.digits) for _ in range(8))
-
-
-# 数据库模型
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    uid = db.Column(db.String(20), unique=True, nullable=False, default=generate_uid)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(256), nullable=False)
-    nodeloc_id = db.Column(db.BigInteger, unique=True)
-    telegram_id = db.Column(db.BigInteger, unique=True)
-    google_id = db.Column(db.String(100), unique=True)
-    is_verified = db.Column(db.Boolean, default=False)
-    is_banned = db.Column(db.Boolean, default=False)
-    is_admin = db.Column(db.Boolean, default=False)
-    role = db.Column(db.String(20), default='user')
-    max_emails = db.Column(db.Integer, default=2)
-    extra_emails = db.Column(db.Integer, default=0)
-    temp_extra_emails = db.Column(db.Integer, default=0)
-    temp_expires_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    emails = db.relationship('RegisteredEmail', backref='owner', lazy=True)
-    verification_tokens = db.relationship('VerificationToken', backref='user', lazy=True)
-    tickets = db.relationship('Ticket', backref='user', lazy=True)
-    redeemed_codes = db.relationship('RedemptionCode', backref='user', lazy=True)
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-    def get_max_emails(self):
-        if self.role == 'owner':
-            return 999999
-        
-        total = self.max_emails + self.extra_emails
-        
-        if self.temp_expires_at and self.temp_expires_at > datetime.utcnow():
-            total += self.temp_extra_emails
-        
-        return total
-
-    def get_email_count(self):
-        return RegisteredEmail.query.filter_by(user_id=self.id).count()
-
-    def can_create_email(self):
-        return self.get_email_count() < self.get_max_emails()
-
-    def is_owner(self):
-        return self.role == 'owner'
-
-    def can_access_admin(self):
-        return self.role == 'owner'
-
-
-class Domain(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    domain = db.Column(db.String(100), unique=True, nullable=False)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    emails = db.relationship('RegisteredEmail', backref='domain_obj', lazy=True)
-
-
-class RegisteredEmail(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email_address = db.Column(db.String(100), unique=True, nullable=False)
-    email_password = db.Column(db.String(100), nullable=False)
-    prefix = db.Column(db.String(50), nullable=False)
-    domain_id = db.Column(db.Integer, db.ForeignKey('domain.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    is_disabled = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class VerificationToken(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String(100), unique=True, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    token_type = db.Column(db.String(20), nullable=False)
-    expires_at = db.Column(db.DateTime, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class Announcement(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class SiteSettings(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    site_name = db.Column(db.String(100), default='邮箱注册系统')
-    site_description = db.Column(db.Text, default='免费邮箱注册服务')
-    site_url = db.Column(db.String(200), default='http://localhost:5000')
-    purchase_code_url = db.Column(db.String(500), default='')
-    tg_group_url = db.Column(db.String(500), default='')
-    default_user_max_emails = db.Column(db.Integer, default=2)
-    default_pro_max_emails = db.Column(db.Integer, default=5)
-    min_user_prefix_length = db.Column(db.Integer, default=7)
-    min_pro_prefix_length = db.Column(db.Integer, default=3)
-    smtp_server = db.Column(db.String(200), default='smtp.example.com')
-    imap_server = db.Column(db.String(200), default='imap.example.com')
-    pop3_server = db.Column(db.String(200), default='pop3.example.com')
-    webmail_url = db.Column(db.String(500), default='https://mail.example.com')
-
-
-class PrefixBlacklist(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    prefix = db.Column(db.String(100), unique=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class AllowedEmailSuffix(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    suffix = db.Column(db.String(100), unique=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class Ticket(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    status = db.Column(db.String(20), default='open')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    closed_at = db.Column(db.DateTime)
-    replies = db.relationship('TicketReply', backref='ticket', lazy=True, cascade='all, delete-orphan')
-
-
-class TicketReply(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user = db.relationship('User', backref='ticket_replies')
-
-
-class AboutPage(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text, default='关于我们')
-
-
-class UserAgreement(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text, default='''
-## 用户协议
-
-欢迎使用本邮箱注册服务！
-
-### 重要声明
-
-本服务按"现状"提供，不保证服务的可靠性、可用性、持续性或安全性。使用本服务的风险由用户自行承担。
-
-### 免责声明
-
-1. 我们不对服务的中断、延迟、错误或数据丢失承担任何责任。
-2. 我们不保证服务能够满足您的特定需求。
-3. 因使用或无法使用本服务而产生的任何直接或间接损失，运营方不承担任何责任。
-4. 我们不对任何第三方内容或链接的准确性、完整性或可用性负责。
+class VersionedCache:
+    """进程内缓存，按 cache_version 表中的版本号失效，多个 worker/实例共享同一版本号。"""
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._versions = {}
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def versions(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    rows = db.session.execute(db.select(CacheVersion.name, CacheVersion.version, CacheVersion.updated_at)).all()
+                    self._versions = {row.name: row for row in rows}
+                    self._checked_at = time.monotonic()
+        return self._versions
+
+    def version(self, name):
+        row = self.versions().get(name)
+        return row.version if row else 0
+
+    def last_modified(self, *names):
+        versions = self.versions()
+        stamps = [versions[n].updated_at for n in names if n in versions and versions[n].updated_at]
+        return max(stamps) if stamps else None
+
+    def get(self, name, loader, depends=()):
+        if depends:
+            version = tuple(self.version(n) for n in (name,) + tuple(depends))
+        else:
+            version = self.version(name)
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        self._entries[name] = (version, value)
+        return value
+
+    def bump(self, name):
+        values = {CacheVersion.version: CacheVersion.version + 1, CacheVersion.updated_at: datetime.utcnow()}
+        if not CacheVersion.query.filter_by(name=name).update(values, synchronize_session=False):
+            try:
+                with db.session.begin_nested():
+                    db.session.add(CacheVersion(name=name, version=1))
+            except IntegrityError:
+                # 并发请求刚插入了同一行，只回滚保存点，改为递增
+                CacheVersion.query.filter_by(name=name).update(values, synchronize_session=False)
+        self._entries.pop(name, None)
+        self._checked_at = 0
+
+
+cache = VersionedCache(CACHE_VERSION_CHECK_INTERVAL)
+
+
+class FragmentCache:
+    """进程内 HTML 片段缓存，按最近使用淘汰。每项记录生成时的版本号，版本号变化即重新渲染。"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, render, sizeof=len):
+        if self.max_bytes <= 0:
+            return render()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = render()
+        size = sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            if size <= self.max_bytes:
+                self._entries[key] = (version, value, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= evicted[2]
+        return value
+
+
+fragment_cache = FragmentCache(int(FRAGMENT_CACHE_MB * 1024 * 1024))
+
+
+def load_site_settings():
+    site_settings = SiteSettings.query.first()
+    if not site_settings:
+        site_settings = SiteSettings()
+        db.session.add(site_settings)
+        db.session.commit()
+    return SimpleNamespace(**{c.name: getattr(site_settings, c.name) for c in SiteSettings.__table__.columns})
+
+
+def get_site_settings():
+    return cache.get('site_settings', load_site_settings)
+
+
+BLACKLIST_MATCH_TYPES = {
+    'exact': '完全匹配',
+    'prefix': '开头匹配',
+    'suffix': '结尾匹配',
+    'substring': '包含匹配',
+    'regex': '正则表达式'
+}
+
+
+class BlacklistMatcher:
+    """把前缀黑名单编译为集合、前缀/后缀字典树、Aho-Corasick 自动机和合并后的正则。"""
+
+    def __init__(self, rules):
+        self.exact = set()
+        self.prefix_trie = {}
+        self.suffix_trie = {}
+        self.regex = None
+        self.separate_regexes = []
+        substrings = []
+        patterns = []
+        for word, match_type in rules:
+            if match_type == 'regex':
+                # 正则保持原样（小写会改变 \D、\W 等的含义），忽略大小写匹配
+                self._add_regex(word, patterns)
+                continue
+            word = word.lower()
+            if match_type == 'exact':
+                self.exact.add(word)
+            elif match_type == 'suffix':
+                self._insert(self.suffix_trie, word[::-1], word)
+            elif match_type == 'substring':
+                substrings.append(word)
+            else:
+                self._insert(self.prefix_trie, word, word)
+        self._build_automaton(substrings)
+        if patterns:
+            self.regex = re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
 
-### 数据安全
+    def _add_regex(self, pattern, patterns):
+        """不含分组的正则合并为一个；含分组（反向引用编号会随合并改变）或内联标志的正则单独编译。"""
+        try:
+            compiled = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            return
+        if compiled.groups == 0 and not pattern.lstrip().startswith('(?'):
+            patterns.append(pattern)
+        else:
+            self.separate_regexes.append(compiled)
 
-我们尽力保护用户数据，但不保证数据的绝对安全。用户应自行承担数据丢失或泄露的风险。
+    @staticmethod
+    def _insert(trie, key, word):
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[None] = word
 
-### 服务变更
+    @staticmethod
+    def _walk(trie, value):
+        node = trie
+        for ch in value:
+            node = node.get(ch)
+            if node is None:
+                return None
+            if None in node:
+                return node[None]
+        return None
+
+    def _build_automaton(self, words):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        for word in words:
+            state = 0
+            for ch in word:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.output[state] = word
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                if self.output[nxt] is None:
+                    self.output[nxt] = self.output[self.fail[nxt]]
+
+    def _search_substring(self, value):
+        if len(self.goto) == 1:
+            return None
+        state = 0
+        for ch in value:
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            if self.output[state] is not None:
+                return self.output[state]
+        return None
+
+    def match(self, value):
+        value = value.lower()
+        if value in self.exact:
+            return value
+        matched = (self._walk(self.prefix_trie, value)
+                   or self._walk(self.suffix_trie, value[::-1])
+                   or self._search_substring(value))
+        if matched is None:
+            for regex in ([self.regex] if self.regex is not None else []) + self.separate_regexes:
+                found = regex.search(value)
+                if found:
+                    return found.group(0) or value
+        return matched
+
+
+def load_prefix_blacklist():
+    rows = db.session.execute(db.select(PrefixBlacklist.prefix, PrefixBlacklist.match_type)).all()
+    return BlacklistMatcher((row.prefix, row.match_type) for row in rows)
+
+
+def get_prefix_blacklist():
+    return cache.get('prefix_blacklist', load_prefix_blacklist)
+
+
+class SuffixMatcher:
+    """允许的邮箱后缀：精确域名放入集合，"@*.example.com" 形式的通配规则按域名逐级查找。"""
+
+    display_limit = 20
+
+    def __init__(self, suffixes):
+        self.domains = set()
+        self.wildcards = set()
+        self.suffixes = []
+        for suffix in suffixes:
+            self.suffixes.append(suffix)
+            domain = suffix.lower().lstrip('@')
+            if domain.startswith('*.'):
+                self.wildcards.add(domain[2:])
+            else:
+                self.domains.add(domain)
+        display = self.suffixes[:self.display_limit]
+        self.display = ', '.join(display) + (' 等' if len(self.suffixes) > self.display_limit else '')
 
-我们保留随时修改、暂停或终止服务的权利，无需提前通知，也不承担任何责任。
+    def __bool__(self):
+        return bool(self.suffixes)
 
-### 使用条款
+    def match(self, email):
+        domain = email.lower().rpartition('@')[2]
+        if domain in self.domains:
+            return True
+        while '.' in domain:
+            domain = domain.split('.', 1)[1]
+            if domain in self.wildcards:
+                return True
+        return False
 
-- 用户不得利用本服务从事任何违法活动
-- 用户不得滥用或干扰本服务的正常运行
-- 我们保留随时终止违规用户账户的权利
 
-### 协议修改
+def load_allowed_suffixes():
+    rows = db.session.execute(db.select(AllowedEmailSuffix.suffix).order_by(AllowedEmailSuffix.id)).scalars().all()
+    return SuffixMatcher(rows)
 
-我们有权随时修改本协议。继续使用服务即表示同意修改后的协议。
 
----
+def get_allowed_suffixes():
+    return cache.get('allowed_email_suffixes', load_allowed_suffixes)
 
-**使用本服务即表示您已阅读、理解并同意本协议的所有条款。**
-''')
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class DomainCatalogue:
+    """域名目录快照，按 id 和域名索引。"""
 
-class RedemptionCode(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    code = db.Column(db.String(100), unique=True, nullable=False)
-    extra_emails = db.Column(db.Integer, default=1)
-    duration_days = db.Column(db.Integer)
-    is_permanent = db.Column(db.Boolean, default=False)
-    is_used = db.Column(db.Boolean, default=False)
-    max_uses = db.Column(db.Integer, default=1)
-    used_count = db.Column(db.Integer, default=0)
-    expires_at = db.Column(db.DateTime)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    used_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    def __init__(self, domains):
+        self.by_id = {}
+        self.by_name = {}
+        for domain in domains:
+            item = SimpleNamespace(**{c.name: getattr(domain, c.name) for c in Domain.__table__.columns})
+            self.by_id[item.id] = item
+            self.by_name[item.domain.lower()] = item
+        self.all = sorted(self.by_id.values(), key=lambda d: d.id)
+        self.active = [d for d in self.all if d.is_active]
 
-    @staticmethod
-    def generate_code():
-        return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(16))
-    
-    def is_expired(self):
-        if self.expires_at and self.expires_at < datetime.utcnow():
-            return True
-        return False
-    
-    def can_be_used(self):
-        if self.is_expired():
-            return False
-        if self.max_uses > 0 and self.used_count >= self.max_uses:
-            return False
-        return True
+    def get(self, domain_id):
+        try:
+            return self.by_id.get(int(domain_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_by_name(self, name):
+        return self.by_name.get((name or '').lower())
+
+
+def load_domain_catalogue():
+    return DomainCatalogue(Domain.query.all())
+
+
+def get_domain_catalogue():
+    return cache.get('domains', load_domain_catalogue)
+
+
+def cached_public_page(name, render):
+    """匿名访问的公共页面按内容版本缓存渲染结果，并带 ETag/Last-Modified 支持 304。"""
+    if current_user.is_authenticated or session.get('_flashes'):
+        return render()
+
+    def build():
+        body = render()
+        return SimpleNamespace(body=body, etag=hashlib.sha1(body.encode('utf-8')).hexdigest())
+
+    page = cache.get(f'page:{request.endpoint}', build, depends=(name, 'site_settings'))
+    response = make_response(page.body)
+    response.set_etag(page.etag)
+    last_modified = cache.last_modified(name, 'site_settings')
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = PUBLIC_PAGE_MAX_AGE
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+class MemoryRateLimitBackend:
+    """进程内令牌桶，单进程部署或每个 worker 各自限流时使用。"""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets, now):
+        """所有桶都有令牌时各扣一个，返回 (None, 0)；否则不扣减，返回 (首个不足的桶序号, 需等待秒数)。"""
+        with self._lock:
+            levels = []
+            for i, (key, capacity, rate) in enumerate(buckets):
+                bucket = self.buckets.get(key)
+                tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                if tokens < 1:
+                    return i, (1 - tokens) / rate
+                levels.append(tokens)
+            for (key, _, _), tokens in zip(buckets, levels):
+                self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > self.max_keys:
+                self._prune(now)
+        return None, 0.0
+
+    def _prune(self, now):
+        # 删除一小时未更新（早已回满）的桶；仍然超出上限时淘汰最早更新的一半
+        stale = [k for k, (_, updated) in self.buckets.items() if now - updated > 3600]
+        for k in stale:
+            del self.buckets[k]
+        if len(self.buckets) > self.max_keys:
+            for k, _ in sorted(self.buckets.items(), key=lambda item: item[1][1])[:len(self.buckets) // 2]:
+                del self.buckets[k]
+
+
+class DatabaseRateLimitBackend:
+    """数据库令牌桶，多实例共享计数；每次检查在独立连接的一个事务中对各个桶执行条件 UPDATE。"""
+
+    def acquire(self, buckets, now):
+        """依次扣减各个桶，任一桶不足时回滚整个事务，已扣减的令牌随之恢复。返回值同 MemoryRateLimitBackend。"""
+        # 首次创建桶时可能与其他进程并发插入；回滚后重试一次即可，此时桶已存在
+        for attempt in range(2):
+            try:
+                return self._acquire(buckets, now)
+            except IntegrityError:
+                if attempt:
+                    raise
+
+    def _acquire(self, buckets, now):
+        table = RateLimitBucket.__table__
+        with db.engine.connect() as conn:
+            with conn.begin() as transaction:
+                for i, (key, capacity, rate) in enumerate(buckets):
+                    refilled = table.c.tokens + (now - table.c.updated_at) * rate
+                    available = db.case((refilled > capacity, capacity), else_=refilled)
+                    taken = conn.execute(
+                        table.update()
+                        .where(table.c.key == key, available >= 1)
+                        .values(tokens=available - 1, updated_at=now)
+                    ).rowcount
+                    if taken:
+                        continue
+                    row = conn.execute(db.select(table.c.tokens, table.c.updated_at).where(table.c.key == key)).first()
+                    if row is None:
+                        # 插入冲突时 IntegrityError 抛出，退出 with 时整个事务回滚并归还连接
+                        conn.execute(table.insert().values(key=key, tokens=capacity - 1, updated_at=now))
+                        continue
+                    transaction.rollback()
+                    tokens = min(capacity, row.tokens + (now - row.updated_at) * rate)
+                    return i, (1 - tokens) / rate
+        return None, 0.0
+
+
+class RateLimiter:
+    """按 IP、用户、登录用户名和路由的令牌桶限流，并统计每个路由的放行与拒绝次数。"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, endpoint, rules):
+        """检查各维度的令牌桶，全部有余量时才各扣一个令牌，返回需要等待的秒数，0 表示放行。
+
+        被拒绝的请求不消耗任何桶，因此已被自身 IP 限制的客户端无法继续耗尽整个路由共享的桶。
+        """
+        if self.backend is None:
+            return 0.0
+        scopes, buckets = [], []
+        for scope, (capacity, period) in rules.items():
+            if scope == 'ip':
+                subject = request.remote_addr or '-'
+            elif scope == 'user':
+                if not current_user.is_authenticated:
+                    continue
+                subject = str(current_user.id)
+            elif scope == 'username':
+                subject = request.form.get('username', '').strip().lower()
+                if not subject:
+                    continue
+            else:
+                subject = '*'
+            scopes.append(scope)
+            buckets.append((f'{endpoint}:{scope}:{subject}', capacity, capacity / period))
+        denied, retry_after = self.backend.acquire(buckets, time.time())
+        self._count(endpoint, 'allowed' if denied is None else f'limited_{scopes[denied]}')
+        return retry_after
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self.counts[(endpoint, outcome)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        stats = {}
+        for (endpoint, outcome), n in counts.items():
+            stats.setdefault(endpoint, Counter())[outcome] = n
+        return stats
+
+
+if RATE_LIMIT_BACKEND == 'database':
+    rate_limiter = RateLimiter(DatabaseRateLimitBackend())
+elif RATE_LIMIT_BACKEND == 'none':
+    rate_limiter = RateLimiter(None)
+else:
+    rate_limiter = RateLimiter(MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS))
+
+
+def rate_limit(**rules):
+    """限制 POST 请求频率，规则为 维度=(次数, 秒)，维度可选 ip / user / username（表单中的登录用户名）/ route。"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method == 'POST':
+                retry_after = rate_limiter.check(request.endpoint, rules)
+                if retry_after:
+                    seconds = max(1, math.ceil(retry_after))
+                    response = make_response(render_template('rate_limited.html', retry_after=seconds), 429)
+                    response.headers['Retry-After'] = str(seconds)
+                    return response
+            return f(*args, **kwargs)
+        decorated.rate_limits = rules
+        return decorated
+    return decorator
 
 
 @login_manager.user_loader
@@ -348,12 +792,7 @@ def load_user(user_id):
 
 @app.context_processor
 def inject_site_settings():
-    site_settings = SiteSettings.query.first()
-    if not site_settings:
-        site_settings = SiteSettings()
-        db.session.add(site_settings)
-        db.session.commit()
-    return dict(site_settings=site_settings)
+    return dict(site_settings=get_site_settings())
 
 
 def generate_token(length=32):
@@ -361,12 +800,165 @@ def generate_token(length=32):
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
 
-def send_email(subject, recipients, body):
-    msg = Message(subject, recipients=recipients, body=body)
-    mail.send(msg)
+def queue_email(subject, recipients, body):
+    """把邮件写入发件箱，随调用方的事务一起提交，提交后由后台发送。"""
+    db.session.add(EmailOutbox(
+        recipients=','.join(recipients),
+        subject=subject,
+        body=body,
+        next_attempt_at=datetime.utcnow()
+    ))
+
+
+class OutboxSender:
+    """后台发件线程：复用 SMTP 连接批量发送发件箱中的邮件，失败按指数退避重试。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._connection = None
+        self._last_used = 0.0
+
+    def wake(self):
+        if OUTBOX_SENDER == 'thread':
+            self.ensure_started()
+            self._wake.set()
+
+    def ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.run_forever, name='outbox-sender', daemon=True)
+            self._thread.start()
+
+    def run_forever(self):
+        while True:
+            try:
+                with app.app_context():
+                    while self.send_batch():
+                        pass
+            except Exception as e:
+                app.logger.warning('发件箱发送失败: %s', e)
+            if self._connection and time.time() - self._last_used > OUTBOX_IDLE_CLOSE:
+                self._close()
+            self._wake.wait(OUTBOX_POLL_INTERVAL)
+            self._wake.clear()
+
+    def claim(self):
+        """条件 UPDATE 领取一批到期邮件，返回 (领取令牌, 租约到期时间, 邮件列表)。
+
+        多进程同时运行时不会重复领取；租约过期的邮件会被重新领取。
+        """
+        now = datetime.utcnow()
+        claim_token = secrets.token_hex(16)
+        lease_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        ids = db.session.execute(
+            db.select(EmailOutbox.id)
+            .where(EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(max(1, min(OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS // OUTBOX_SEND_TIMEOUT - 1)))
+        ).scalars().all()
+        if not ids:
+            db.session.rollback()
+            return claim_token, lease_until, []
+        db.session.execute(
+            db.update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids), EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now)
+            .values(status='sending', claim_token=claim_token, next_attempt_at=lease_until),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        messages = db.session.execute(
+            db.select(EmailOutbox.id, EmailOutbox.subject, EmailOutbox.recipients, EmailOutbox.body, EmailOutbox.attempts)
+            .where(EmailOutbox.claim_token == claim_token, EmailOutbox.status == 'sending')
+            .order_by(EmailOutbox.id)
+        ).all()
+        db.session.commit()
+        return claim_token, lease_until, messages
+
+    def finish(self, claim_token, ids, **values):
+        """仅在仍持有租约（领取令牌未变）时更新邮件状态并立即提交，返回更新的行数。"""
+        updated = db.session.execute(
+            db.update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids), EmailOutbox.claim_token == claim_token)
+            .values(claim_token=None, **values),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+        return updated
+
+    def send_batch(self):
+        """发送一批邮件，返回是否领取到了邮件。每封邮件发送后立即提交，中途崩溃不会重发已发送的邮件。"""
+        claim_token, lease_until, messages = self.claim()
+        for i, item in enumerate(messages):
+            if datetime.utcnow() + timedelta(seconds=OUTBOX_SEND_TIMEOUT) > lease_until:
+                # 租约即将到期，交还剩余邮件，避免与重新领取的进程重复发送
+                self.finish(claim_token, [m.id for m in messages[i:]], status='pending', next_attempt_at=datetime.utcnow())
+                break
+            attempts = item.attempts + 1
+            try:
+                self._send(Message(item.subject, recipients=item.recipients.split(','), body=item.body))
+            except Exception as e:
+                self._close()
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    values = {'status': 'failed'}
+                else:
+                    delay = min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+                    values = {'status': 'pending', 'next_attempt_at': datetime.utcnow() + timedelta(seconds=delay)}
+                values['last_error'] = str(e)[:1000]
+            else:
+                values = {'status': 'sent', 'sent_at': datetime.utcnow(), 'last_error': None}
+            if not self.finish(claim_token, [item.id], attempts=attempts, **values):
+                app.logger.warning('发件箱邮件 %s 的租约已被其他进程接管', item.id)
+        return bool(messages)
+
+    def _send(self, message):
+        if self._connection is None:
+            self._connection = mail.connect().__enter__()
+            self._connection.host.sock.settimeout(OUTBOX_SEND_TIMEOUT)
+        self._connection.send(message)
+        self._last_used = time.time()
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+
+
+outbox_sender = OutboxSender()
+
+
+@app.before_request
+def start_outbox_sender():
+    # 进程启动后（包括 fork 出的 worker）第一次请求时启动发件线程，补发重启前未发送的邮件
+    if OUTBOX_SENDER == 'thread':
+        outbox_sender.ensure_started()
+
+
+@app.cli.command('send-outbox')
+@click.option('--once', is_flag=True, help='发送完当前到期的邮件后退出')
+def send_outbox_command(once):
+    """独立运行发件箱发送进程。"""
+    if once:
+        sent = 0
+        while outbox_sender.send_batch():
+            sent += 1
+        outbox_sender._close()
+        click.echo(f'已处理 {sent} 批邮件')
+    else:
+        outbox_sender.run_forever()
 
 
 def serv00_login_and_create_email(prefix, domain, password):
+    import requests
+    from bs4 import BeautifulSoup
+
     session_req = requests.Session()
     user_agent = "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1"
     login_url = f"https://{SERV00_PANEL}/login/?next=/mail/add"
@@ -419,6 +1011,9 @@ def serv00_login_and_create_email(prefix, domain, password):
 
 
 def serv00_reset_password(email_address, new_password):
+    import requests
+    from bs4 import BeautifulSoup
+
     username_part, domain_part = email_address.split('@', 1)
     
     session_req = requests.Session()
@@ -537,7 +1132,46 @@ def serv00_reset_password(email_address, new_password):
         return {"success": False, "message": "密码重置失败"}
 
 
+_asset_manifest = None
+
+
+def asset_manifest():
+    """读取 build_assets.py 生成的清单，未构建时返回空字典，页面回退到 CDN（仅开发环境或设置了 ASSET_CDN_FALLBACK）。调试模式下每次重新读取。"""
+    global _asset_manifest
+    if _asset_manifest is None or app.debug:
+        try:
+            with open(os.path.join(app.static_folder, 'dist', 'manifest.json'), encoding='utf-8') as f:
+                _asset_manifest = json.load(f)
+        except FileNotFoundError:
+            _asset_manifest = {}
+    return _asset_manifest
+
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    """带哈希的构建产物：按 Accept-Encoding 返回预压缩的 brotli / gzip 版本，并标记为不可变。"""
+    directory = os.path.join(app.static_folder, 'dist')
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        path = safe_join(directory, filename + suffix)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 # 路由
+@app.context_processor
+def inject_assets():
+    return dict(assets=asset_manifest())
+
+
 @app.context_processor
 def inject_recaptcha_key():
     return dict(recaptcha_site_key=RECAPTCHA_SITE_KEY, recaptcha_api_url=RECAPTCHA_API_URL, recaptcha_enabled=RECAPTCHA_ENABLED)
@@ -596,6 +1230,8 @@ def auth_nodeloc_callback():
     if not NODELOC_ENABLED:
         flash('NodeLoc登录未启用', 'danger')
         return redirect(url_for('login'))
+
+    import requests
     
     code = request.args.get('code')
     state = request.args.get('state')
@@ -853,6 +1489,8 @@ def auth_google_callback():
     if not GOOGLE_ENABLED or not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
         flash('Google登录未启用', 'danger')
         return redirect(url_for('login'))
+
+    import requests
     
     code = request.args.get('code')
     state = request.args.get('state')
@@ -942,12 +1580,16 @@ def auth_google_unbind():
 
 
 @app.route('/')
+@read_replica
 def index():
-    announcements = Announcement.query.filter_by(is_active=True).order_by(Announcement.created_at.desc()).all()
-    return render_template('index.html', announcements=announcements)
+    def render():
+        announcements = Announcement.query.filter_by(is_active=True).order_by(Announcement.created_at.desc()).all()
+        return render_template('index.html', announcements=announcements)
+    return cached_public_page('announcements', render)
 
 
 @app.route('/register', methods=['GET', 'POST'])
+@rate_limit(ip=(5, 600), route=(60, 60))
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('dashboard'))
@@ -963,8 +1605,10 @@ def register():
             flash('请同意用户协议', 'danger')
             return redirect(url_for('register'))
         
-        recaptcha_response = request.form.get('g-recaptcha-response')
-        if not verify_recaptcha(recaptcha_response):
+        recaptcha = start_recaptcha(request.form.get('g-recaptcha-response'))
+        username_taken = User.query.filter_by(username=username).first() is not None
+        email_taken = User.query.filter_by(email=email).first() is not None
+        if not recaptcha.passed():
             flash('请完成人机验证', 'danger')
             return redirect(url_for('register'))
 
@@ -972,28 +1616,20 @@ def register():
             flash('两次输入的密码不一致', 'danger')
             return redirect(url_for('register'))
 
-        if User.query.filter_by(username=username).first():
+        if username_taken:
             flash('用户名已存在', 'danger')
             return redirect(url_for('register'))
 
-        if User.query.filter_by(email=email).first():
+        if email_taken:
             flash('邮箱已被注册', 'danger')
             return redirect(url_for('register'))
 
-        allowed_suffixes = [s.suffix for s in AllowedEmailSuffix.query.all()]
-        if allowed_suffixes:
-            email_lower = email.lower()
-            valid = False
-            for suffix in allowed_suffixes:
-                if email_lower.endswith(suffix.lower()):
-                    valid = True
-                    break
-            if not valid:
-                allowed_list = ', '.join(allowed_suffixes)
-                flash(f'只允许使用以下邮箱后缀注册：{allowed_list}', 'danger')
-                return redirect(url_for('register'))
+        allowed_suffixes = get_allowed_suffixes()
+        if allowed_suffixes and not allowed_suffixes.match(email):
+            flash(f'只允许使用以下邮箱后缀注册：{allowed_suffixes.display}', 'danger')
+            return redirect(url_for('register'))
 
-        site_settings = SiteSettings.query.first()
+        site_settings = get_site_settings()
         default_max_emails = site_settings.default_user_max_emails if site_settings else 2
         user = User(username=username, email=email, is_verified=False, max_emails=default_max_emails)
         user.set_password(password)
@@ -1008,13 +1644,14 @@ def register():
             expires_at=datetime.utcnow() + timedelta(hours=24)
         )
         db.session.add(verification_token)
-        db.session.commit()
 
-        site_settings = SiteSettings.query.first()
+        site_settings = get_site_settings()
         base_url = site_settings.site_url if site_settings else 'http://localhost:5000'
         verify_url = f"{base_url}{url_for('verify_email', token=token)}"
         email_body = f'请点击以下链接验证您的邮箱：\n{verify_url}\n\n该链接24小时内有效。'
-        send_email('邮箱验证', [email], email_body)
+        queue_email('邮箱验证', [email], email_body)
+        db.session.commit()
+        outbox_sender.wake()
 
         flash('注册成功！请检查您的邮箱以完成验证', 'success')
         return redirect(url_for('login'))
@@ -1040,6 +1677,7 @@ def verify_email(token):
 
 @app.route('/resend-verification', methods=['POST'])
 @login_required
+@rate_limit(user=(3, 600), ip=(10, 600))
 def resend_verification():
     if current_user.is_verified:
         flash('您的邮箱已验证', 'info')
@@ -1057,19 +1695,21 @@ def resend_verification():
         expires_at=datetime.utcnow() + timedelta(hours=24)
     )
     db.session.add(verification_token)
-    db.session.commit()
 
-    site_settings = SiteSettings.query.first()
+    site_settings = get_site_settings()
     base_url = site_settings.site_url if site_settings else 'http://localhost:5000'
     verify_url = f"{base_url}{url_for('verify_email', token=token)}"
     email_body = f'请点击以下链接验证您的邮箱：\n{verify_url}\n\n该链接24小时内有效。'
-    send_email('邮箱验证', [current_user.email], email_body)
+    queue_email('邮箱验证', [current_user.email], email_body)
+    db.session.commit()
+    outbox_sender.wake()
 
     flash('验证邮件已重新发送', 'success')
     return redirect(url_for('dashboard'))
 
 
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limit(ip=(10, 60), username=(10, 600))
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('dashboard'))
@@ -1078,12 +1718,16 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        recaptcha_response = request.form.get('g-recaptcha-response')
-        if not verify_recaptcha(recaptcha_response):
+        # 人机验证在后台进行，同时只查询用户；密码哈希开销大，须在验证通过后再校验
+        recaptcha = start_recaptcha(request.form.get('g-recaptcha-response'))
+        if recaptcha.rejected():
             flash('请完成人机验证', 'danger')
             return redirect(url_for('login'))
-
         user = User.query.filter_by(username=username).first()
+        if not recaptcha.passed():
+            flash('请完成人机验证', 'danger')
+            return redirect(url_for('login'))
+
         if user and user.check_password(password):
             if user.is_banned:
                 flash('您的账户已被封禁', 'danger')
@@ -1103,6 +1747,7 @@ def login():
 
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limit(ip=(5, 600), route=(60, 60))
 def forgot_password():
     if current_user.is_authenticated:
         return redirect(url_for('dashboard'))
@@ -1110,12 +1755,11 @@ def forgot_password():
     if request.method == 'POST':
         email = request.form['email']
         
-        recaptcha_response = request.form.get('g-recaptcha-response')
-        if not verify_recaptcha(recaptcha_response):
+        recaptcha = start_recaptcha(request.form.get('g-recaptcha-response'))
+        user = User.query.filter_by(email=email).first()
+        if not recaptcha.passed():
             flash('请完成人机验证', 'danger')
             return redirect(url_for('forgot_password'))
-        
-        user = User.query.filter_by(email=email).first()
 
         if user:
             token = generate_token()
@@ -1126,13 +1770,14 @@ def forgot_password():
                 expires_at=datetime.utcnow() + timedelta(hours=1)
             )
             db.session.add(verification_token)
-            db.session.commit()
 
-            site_settings = SiteSettings.query.first()
+            site_settings = get_site_settings()
             base_url = site_settings.site_url if site_settings else 'http://localhost:5000'
             reset_url = f"{base_url}{url_for('reset_password', token=token)}"
             email_body = f'请点击以下链接重置您的密码：\n{reset_url}\n\n该链接1小时内有效。'
-            send_email('密码重置', [email], email_body)
+            queue_email('密码重置', [user.email], email_body)
+            db.session.commit()
+            outbox_sender.wake()
 
         flash('如果该邮箱已注册，您将收到重置密码的邮件', 'info')
         return redirect(url_for('login'))
@@ -1151,8 +1796,7 @@ def reset_password(token):
         password = request.form['password']
         confirm_password = request.form['confirm_password']
         
-        recaptcha_response = request.form.get('g-recaptcha-response')
-        if not verify_recaptcha(recaptcha_response):
+        if not start_recaptcha(request.form.get('g-recaptcha-response')).passed():
             flash('请完成人机验证', 'danger')
             return redirect(url_for('reset_password', token=token))
 
@@ -1161,7 +1805,7 @@ def reset_password(token):
             return redirect(url_for('reset_password', token=token))
 
         user = verification_token.user
-        user.set_password(password)
+        user.password_hash = generate_password_hash(password)
         db.session.delete(verification_token)
         db.session.commit()
 
@@ -1203,23 +1847,49 @@ def change_password():
 
 
 @app.route('/about')
+@read_replica
 def about():
-    about_page = AboutPage.query.first()
-    if not about_page:
-        about_page = AboutPage()
-        db.session.add(about_page)
-        db.session.commit()
-    return render_template('about.html', about_page=about_page)
+    def render():
+        about_page = AboutPage.query.first()
+        if not about_page:
+            about_page = AboutPage()
+            db.session.add(about_page)
+            db.session.commit()
+        return render_template('about.html', about_page=about_page)
+    return cached_public_page('about_page', render)
+
+
+def ticket_list_query(status=None, user_id=None):
+    query = Ticket.query.options(db.joinedload(Ticket.user))
+    if user_id is not None:
+        query = query.filter(Ticket.user_id == user_id)
+    if status in ('open', 'closed'):
+        query = query.filter(Ticket.status == status)
+    return query.order_by(Ticket.created_at.desc(), Ticket.id.desc())
+
+
+def add_ticket_reply(ticket, content, is_admin=False):
+    now = datetime.utcnow()
+    reply = TicketReply(ticket_id=ticket.id, user_id=current_user.id, content=content, is_admin=is_admin, created_at=now)
+    db.session.add(reply)
+    Ticket.query.filter_by(id=ticket.id).update({
+        Ticket.reply_count: db.func.coalesce(Ticket.reply_count, 0) + 1,
+        Ticket.last_reply_at: now
+    }, synchronize_session=False)
+    return reply
 
 
 @app.route('/tickets')
+@read_replica
 @login_required
 def tickets():
+    status = request.args.get('status', '')
     if current_user.can_access_admin():
-        tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
+        query = ticket_list_query(status)
     else:
-        tickets = Ticket.query.filter_by(user_id=current_user.id).order_by(Ticket.created_at.desc()).all()
-    return render_template('tickets.html', tickets=tickets)
+        query = ticket_list_query(status, user_id=current_user.id)
+    pagination = query.paginate(per_page=TICKET_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False)
+    return render_template('tickets.html', tickets=pagination.items, pagination=pagination, status=status)
 
 
 @app.route('/tickets/create', methods=['GET', 'POST'])
@@ -1233,8 +1903,7 @@ def create_ticket():
         db.session.add(ticket)
         db.session.flush()
 
-        reply = TicketReply(ticket_id=ticket.id, user_id=current_user.id, content=content)
-        db.session.add(reply)
+        add_ticket_reply(ticket, content)
         db.session.commit()
 
         flash('工单创建成功！', 'success')
@@ -1244,6 +1913,7 @@ def create_ticket():
 
 
 @app.route('/tickets/<int:ticket_id>', methods=['GET', 'POST'])
+@read_replica
 @login_required
 def view_ticket(ticket_id):
     ticket = Ticket.query.get_or_404(ticket_id)
@@ -1255,19 +1925,19 @@ def view_ticket(ticket_id):
     if request.method == 'POST':
         content = request.form['content']
 
-        reply = TicketReply(
-            ticket_id=ticket.id,
-            user_id=current_user.id,
-            content=content,
-            is_admin=current_user.can_access_admin()
-        )
-        db.session.add(reply)
+        add_ticket_reply(ticket, content, is_admin=current_user.can_access_admin())
         db.session.commit()
 
+        last_page = max(1, -(-(ticket.reply_count or 0) // TICKET_REPLY_PAGE_SIZE))
         flash('回复成功！', 'success')
-        return redirect(url_for('view_ticket', ticket_id=ticket_id))
+        return redirect(url_for('view_ticket', ticket_id=ticket_id, page=last_page))
 
-    return render_template('view_ticket.html', ticket=ticket)
+    pagination = TicketReply.query.options(
+        db.joinedload(TicketReply.user)
+    ).filter_by(ticket_id=ticket.id).order_by(
+        TicketReply.created_at.asc(), TicketReply.id.asc()
+    ).paginate(per_page=TICKET_REPLY_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False)
+    return render_template('view_ticket.html', ticket=ticket, replies=pagination.items, pagination=pagination)
 
 
 @app.route('/tickets/<int:ticket_id>/close')
@@ -1302,14 +1972,53 @@ def open_ticket(ticket_id):
     return redirect(url_for('tickets'))
 
 
+def render_dashboard_fragments(user_id):
+    emails = RegisteredEmail.query.filter_by(user_id=user_id).all()
+    return SimpleNamespace(
+        email_count=len(emails),
+        email_list=get_template_attribute('_dashboard_emails.html', 'render_email_list')(emails),
+        email_modals=get_template_attribute('_dashboard_emails.html', 'render_email_modals')(
+            emails, RECAPTCHA_ENABLED, RECAPTCHA_SITE_KEY
+        )
+    )
+
+
+def dashboard_fragments(user):
+    """用户中心的邮箱数量、邮箱列表和弹窗，按用户数据版本号缓存；调试模式下每次重新渲染以便修改模板。"""
+    if app.debug:
+        return render_dashboard_fragments(user.id)
+    return fragment_cache.get(
+        ('dashboard', user.id), user.data_version,
+        lambda: render_dashboard_fragments(user.id),
+        sizeof=lambda f: len(f.email_list) + len(f.email_modals)
+    )
+
+
+def bump_data_version(*user_ids):
+    """递增用户的数据版本号，使其用户中心缓存片段失效，随调用方的事务一起提交。"""
+    db.session.execute(
+        db.update(User).where(User.id.in_(user_ids)).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def bump_email_owners(*criteria):
+    """递增符合条件的邮箱所属用户的数据版本号，须在修改或删除这些邮箱之前调用。"""
+    owners = db.select(RegisteredEmail.user_id).where(*criteria).distinct().scalar_subquery()
+    db.session.execute(
+        db.update(User).where(User.id.in_(owners)).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
 @app.route('/dashboard')
+@read_replica
 @login_required
 def dashboard():
-    domains = Domain.query.filter_by(is_active=True).all()
-    emails = RegisteredEmail.query.filter_by(user_id=current_user.id).all()
+    domains = get_domain_catalogue().active
     return render_template('dashboard.html', 
                            domains=domains, 
-                           emails=emails, 
+                           fragments=dashboard_fragments(current_user), 
                            datetime=datetime,
                            nodeloc_enabled=NODELOC_ENABLED,
                            telegram_enabled=TELEGRAM_ENABLED,
@@ -1317,8 +2026,54 @@ def dashboard():
                            google_enabled=GOOGLE_ENABLED)
 
 
+def lock_user_quota(user_id, *other_user_ids):
+    """开启新事务并对用户行加写锁，返回最新的用户数据；同一用户的配额检查与写入因此串行执行。
+
+    加锁的 UPDATE 同时递增数据版本号，事务回滚时版本号不变；other_user_ids 中的用户在同一条语句中一并加锁并递增。
+    """
+    db.session.commit()
+    db.session.execute(
+        db.update(User).where(User.id.in_((user_id,) + other_user_ids)).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+    return db.session.get(User, user_id, populate_existing=True)
+
+
+def claim_email_slot(user_id, **fields):
+    """在用户行锁内检查配额并写入邮箱记录，返回 (状态, 邮箱)。"""
+    user = lock_user_quota(user_id)
+    if user.get_email_count() >= user.get_max_emails():
+        db.session.rollback()
+        return 'quota', None
+    email = RegisteredEmail(user_id=user_id, **fields)
+    db.session.add(email)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return 'exists', None
+    return 'ok', email
+
+
+def transfer_email_to(email_id, from_user_id, to_user_id):
+    """在目标用户行锁内检查配额，并用条件 UPDATE 转移邮箱，返回状态。"""
+    target = lock_user_quota(to_user_id, from_user_id)
+    if target.get_email_count() >= target.get_max_emails():
+        db.session.rollback()
+        return 'quota'
+    moved = RegisteredEmail.query.filter_by(id=email_id, user_id=from_user_id, is_disabled=False).update(
+        {RegisteredEmail.user_id: to_user_id}, synchronize_session=False
+    )
+    if not moved:
+        db.session.rollback()
+        return 'moved'
+    db.session.commit()
+    return 'ok'
+
+
 @app.route('/create-email', methods=['POST'])
 @login_required
+@rate_limit(user=(10, 600), ip=(20, 600))
 def create_email():
 
     if not current_user.is_verified:
@@ -1335,12 +2090,17 @@ def create_email():
             flash(error, 'danger')
         return redirect(url_for('dashboard'))
     
-    recaptcha_response = request.form.get('g-recaptcha-response')
-    if not verify_recaptcha(recaptcha_response):
+    # 人机验证在后台进行，同时预先查询配额和邮箱是否已存在
+    recaptcha = start_recaptcha(request.form.get('g-recaptcha-response'))
+    can_create = current_user.can_create_email()
+    domain = get_domain_catalogue().get(domain_id)
+    full_email = f"{prefix}{domain.domain}" if domain else None
+    existing_email = RegisteredEmail.query.filter_by(email_address=full_email).first() if domain else None
+    if not recaptcha.passed():
         flash('请完成人机验证', 'danger')
         return redirect(url_for('dashboard'))
 
-    site_settings = SiteSettings.query.first()
+    site_settings = get_site_settings()
     if current_user.role == 'user':
         min_length = site_settings.min_user_prefix_length if site_settings else 7
         if len(prefix) < min_length:
@@ -1352,29 +2112,18 @@ def create_email():
             flash(f'Pro用户邮箱前缀必须不少于{min_length}个字符', 'danger')
             return redirect(url_for('dashboard'))
 
-    if not current_user.can_create_email():
+    if not can_create:
         flash(f'已达到邮箱数量上限（当前: {current_user.get_email_count()}/{current_user.get_max_emails()}）', 'danger')
         return redirect(url_for('dashboard'))
     
-    prefix_lower = prefix.lower()
-    blacklisted = PrefixBlacklist.query.filter(
-        db.or_(
-            PrefixBlacklist.prefix == prefix_lower,
-            PrefixBlacklist.prefix.like(f'{prefix_lower}%')
-        )
-    ).first()
-    if blacklisted:
+    if get_prefix_blacklist().match(prefix):
         flash(f'邮箱前缀 "{prefix}" 不允许使用，请更换其他前缀', 'danger')
         return redirect(url_for('dashboard'))
 
-    domain = Domain.query.get(domain_id)
     if not domain or not domain.is_active:
         flash('无效的域名', 'danger')
         return redirect(url_for('dashboard'))
 
-    full_email = f"{prefix}{domain.domain}"
-
-    existing_email = RegisteredEmail.query.filter_by(email_address=full_email).first()
     if existing_email:
         if existing_email.is_disabled:
             flash('该邮箱已被管理员禁用', 'danger')
@@ -1382,19 +2131,28 @@ def create_email():
             flash('该邮箱已被注册', 'danger')
         return redirect(url_for('dashboard'))
 
+    # 先在行锁内占用配额，再调用面板创建，失败时释放
+    status, new_email = claim_email_slot(
+        current_user.id,
+        email_address=full_email,
+        email_password=email_password,
+        prefix=prefix,
+        domain_id=domain.id
+    )
+    if status == 'quota':
+        flash(f'已达到邮箱数量上限（当前: {current_user.get_email_count()}/{current_user.get_max_emails()}）', 'danger')
+        return redirect(url_for('dashboard'))
+    if status == 'exists':
+        flash('该邮箱已被注册', 'danger')
+        return redirect(url_for('dashboard'))
+
     result = serv00_login_and_create_email(prefix, domain.domain, email_password)
     if result['success']:
-        new_email = RegisteredEmail(
-            email_address=full_email,
-            email_password=email_password,
-            prefix=prefix,
-            domain_id=domain_id,
-            user_id=current_user.id
-        )
-        db.session.add(new_email)
-        db.session.commit()
         flash(f'邮箱 {full_email} 创建成功！', 'success')
     else:
+        RegisteredEmail.query.filter_by(id=new_email.id).delete(synchronize_session=False)
+        bump_data_version(current_user.id)
+        db.session.commit()
         flash(f'邮箱创建失败: {result["message"]}', 'danger')
 
     return redirect(url_for('dashboard'))
@@ -1424,6 +2182,7 @@ def reset_email_password(email_id):
 
     if result['success']:
         email.email_password = new_password
+        bump_data_version(current_user.id)
         db.session.commit()
         flash('邮箱密码重置成功！', 'success')
     else:
@@ -1434,6 +2193,7 @@ def reset_email_password(email_id):
 
 @app.route('/transfer-email/<int:email_id>', methods=['POST'])
 @login_required
+@rate_limit(user=(10, 600), ip=(20, 600))
 def transfer_email(email_id):
     email = RegisteredEmail.query.get_or_404(email_id)
     if email.user_id != current_user.id:
@@ -1444,17 +2204,17 @@ def transfer_email(email_id):
         flash('该邮箱已被禁用，无法转移', 'danger')
         return redirect(url_for('dashboard'))
     
-    recaptcha_response = request.form.get('g-recaptcha-response')
-    if not verify_recaptcha(recaptcha_response):
+    recaptcha = start_recaptcha(request.form.get('g-recaptcha-response'))
+    target_uid = request.form.get('target_uid', '').strip()
+    target_user = User.query.filter_by(uid=target_uid).first() if target_uid else None
+    if not recaptcha.passed():
         flash('请完成人机验证', 'danger')
         return redirect(url_for('dashboard'))
     
-    target_uid = request.form.get('target_uid', '').strip()
     if not target_uid:
         flash('请输入目标用户UID', 'danger')
         return redirect(url_for('dashboard'))
     
-    target_user = User.query.filter_by(uid=target_uid).first()
     if not target_user:
         flash('目标用户不存在', 'danger')
         return redirect(url_for('dashboard'))
@@ -1467,18 +2227,20 @@ def transfer_email(email_id):
         flash('目标用户未验证邮箱', 'danger')
         return redirect(url_for('dashboard'))
     
-    if not target_user.can_create_email():
+    status = transfer_email_to(email.id, current_user.id, target_user.id)
+    if status == 'quota':
         flash('目标用户邮箱配额已满', 'danger')
         return redirect(url_for('dashboard'))
-    
-    email.user_id = target_user.id
-    db.session.commit()
+    if status == 'moved':
+        flash('邮箱状态已变化，请刷新后重试', 'danger')
+        return redirect(url_for('dashboard'))
     
     flash(f'邮箱 {email.email_address} 已成功转移给用户 {target_user.username}！', 'success')
     return redirect(url_for('dashboard'))
 
 
 @app.route('/admin')
+@read_replica
 @login_required
 def admin_dashboard():
     if not current_user.is_owner():
@@ -1607,7 +2369,16 @@ def admin_cleanup_all():
     return redirect(url_for('admin_dashboard'))
 
 
+def user_list_filters(args):
+    """用户管理列表、导出与批量操作共用的筛选条件。列表页只显示前 USER_SEARCH_LIMIT 个结果，这里不限数量。"""
+    search = args.get('search', '').strip()
+    if search:
+        return [user_search_filter(search)]
+    return []
+
+
 @app.route('/admin/users')
+@read_replica
 @login_required
 def admin_users():
     if not current_user.can_access_admin():
@@ -1615,15 +2386,31 @@ def admin_users():
         return redirect(url_for('dashboard'))
 
     search_query = request.args.get('search', '')
+    pagination = None
     if search_query:
-        users = User.query.filter(
-            (User.username.contains(search_query)) |
-            (User.email.contains(search_query)) |
-            (User.uid.contains(search_query))
-        ).all()
+        users = search_users(search_query)
     else:
-        users = User.query.all()
-    return render_template('admin/users.html', users=users, search_query=search_query)
+        pagination = User.query.order_by(User.id.desc()).paginate(per_page=ADMIN_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False)
+        users = pagination.items
+    return render_template('admin/users.html', users=users, pagination=pagination, search_query=search_query, search_limit=USER_SEARCH_LIMIT)
+
+
+@app.route('/admin/users/search')
+@read_replica
+@login_required
+def admin_search_users():
+    if not current_user.can_access_admin():
+        return jsonify({'error': '无权访问'}), 403
+
+    limit = min(request.args.get('limit', 10, type=int), USER_SEARCH_LIMIT)
+    users = search_users(request.args.get('q', ''), limit=max(limit, 1))
+    return jsonify([{
+        'id': user.id,
+        'uid': user.uid,
+        'username': user.username,
+        'email': user.email if current_user.is_owner() else None,
+        'role': user.role
+    } for user in users])
 
 
 @app.route('/admin/users/ban/<int:user_id>')
@@ -1679,7 +2466,87 @@ def admin_delete_user(user_id):
     return redirect(url_for('admin_users'))
 
 
+BULK_CHUNK_SIZE = 500
+
+
+def run_bulk_action(model, filters, apply):
+    """按主键分块执行批量操作，每次请求处理一块并提交，返回进度供前端继续。"""
+    if request.form.get('scope') == 'filter':
+        criteria = filters(request.form)
+        if not criteria:
+            # 没有筛选条件时“当前筛选的全部记录”就是整张表，不允许一次性操作
+            return jsonify({'error': '请先输入筛选条件'}), 400
+    else:
+        ids = request.form.getlist('ids', type=int)
+        if not ids:
+            return jsonify({'error': '请先选择要操作的记录'}), 400
+        criteria = [model.id.in_(ids)]
+
+    after = request.form.get('after', 0, type=int)
+    total = None
+    if not after:
+        total = db.session.scalar(db.select(db.func.count()).select_from(model).where(*criteria))
+    chunk = db.session.execute(
+        db.select(model.id).where(*criteria, model.id > after).order_by(model.id).limit(BULK_CHUNK_SIZE)
+    ).scalars().all()
+    affected = apply(chunk) if chunk else 0
+    db.session.commit()
+    return jsonify({
+        'total': total,
+        'processed': len(chunk),
+        'affected': affected,
+        'next': chunk[-1] if len(chunk) == BULK_CHUNK_SIZE else None
+    })
+
+
+def bulk_set_user_banned(ids, banned):
+    return db.session.execute(
+        db.update(User).where(User.id.in_(ids), User.role != 'owner').values(is_banned=banned),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+
+def bulk_delete_users(ids):
+    # 与单个删除一致，连带删除邮箱和验证令牌；仍有工单、回复或兑换记录的用户跳过
+    user_ids = db.session.execute(
+        db.select(User.id).where(
+            User.id.in_(ids),
+            User.role != 'owner',
+            ~db.exists().where(Ticket.user_id == User.id),
+            ~db.exists().where(TicketReply.user_id == User.id),
+            ~db.exists().where(RedemptionCode.user_id == User.id)
+        )
+    ).scalars().all()
+    if not user_ids:
+        return 0
+    for model in (RegisteredEmail, VerificationToken, UserSearchGram):
+        db.session.execute(db.delete(model).where(model.user_id.in_(user_ids)),
+                           execution_options={'synchronize_session': False})
+    db.session.execute(db.delete(User).where(User.id.in_(user_ids)), execution_options={'synchronize_session': False})
+    return len(user_ids)
+
+
+BULK_USER_ACTIONS = {
+    'ban': lambda ids: bulk_set_user_banned(ids, True),
+    'unban': lambda ids: bulk_set_user_banned(ids, False),
+    'delete': bulk_delete_users,
+}
+
+
+@app.route('/admin/users/bulk', methods=['POST'])
+@login_required
+def admin_bulk_users():
+    if not current_user.can_access_admin():
+        return jsonify({'error': '无权访问'}), 403
+
+    action = BULK_USER_ACTIONS.get(request.form.get('action'))
+    if not action:
+        return jsonify({'error': '无效的操作'}), 400
+    return run_bulk_action(User, user_list_filters, action)
+
+
 @app.route('/admin/domains')
+@read_replica
 @login_required
 def admin_domains():
     if not current_user.is_owner():
@@ -1703,6 +2570,7 @@ def admin_add_domain():
     else:
         domain = Domain(domain=domain_name)
         db.session.add(domain)
+        cache.bump('domains')
         db.session.commit()
         flash('域名添加成功', 'success')
 
@@ -1718,6 +2586,7 @@ def admin_toggle_domain(domain_id):
 
     domain = Domain.query.get_or_404(domain_id)
     domain.is_active = not domain.is_active
+    cache.bump('domains')
     db.session.commit()
     flash('域名状态已更新', 'success')
 
@@ -1732,26 +2601,83 @@ def admin_delete_domain(domain_id):
         return redirect(url_for('dashboard'))
 
     domain = Domain.query.get_or_404(domain_id)
+    bump_email_owners(RegisteredEmail.domain_id == domain_id)
     RegisteredEmail.query.filter_by(domain_id=domain_id).delete()
     db.session.delete(domain)
+    cache.bump('domains')
     db.session.commit()
     flash('域名已删除', 'success')
 
     return redirect(url_for('admin_domains'))
 
 
+def email_list_filters(args):
+    """邮箱管理列表、导出与批量操作共用的筛选条件。"""
+    criteria = []
+    domain_id = args.get('domain_id', type=int)
+    owner_uid = args.get('owner_uid', '').strip()
+    status = args.get('status', '')
+    address = args.get('address', '').strip()
+    if domain_id:
+        criteria.append(RegisteredEmail.domain_id == domain_id)
+    if owner_uid:
+        owner = User.query.filter_by(uid=owner_uid).first()
+        criteria.append(RegisteredEmail.user_id == (owner.id if owner else -1))
+    if status == 'disabled':
+        criteria.append(RegisteredEmail.is_disabled == True)
+    elif status == 'active':
+        criteria.append(RegisteredEmail.is_disabled == False)
+    if address:
+        criteria.append(RegisteredEmail.email_address.startswith(address, autoescape=True))
+    return criteria
+
+
 @app.route('/admin/emails')
+@read_replica
 @login_required
 def admin_emails():
     if not current_user.is_owner():
         flash('无权访问', 'danger')
         return redirect(url_for('dashboard'))
 
-    if current_user.is_owner():
-        emails = RegisteredEmail.query.all()
+    domain_id = request.args.get('domain_id', type=int)
+    owner_uid = request.args.get('owner_uid', '').strip()
+    status = request.args.get('status', '')
+    address = request.args.get('address', '').strip()
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc')
+
+    query = RegisteredEmail.query.options(
+        db.joinedload(RegisteredEmail.owner),
+        db.joinedload(RegisteredEmail.domain_obj)
+    )
+    if not current_user.is_owner():
+        query = query.join(User, RegisteredEmail.user_id == User.id).filter(User.role != 'owner')
+    query = query.filter(*email_list_filters(request.args))
+
+    sort_columns = {
+        'created_at': RegisteredEmail.created_at,
+        'email_address': RegisteredEmail.email_address,
+        'id': RegisteredEmail.id
+    }
+    sort_column = sort_columns.get(sort, RegisteredEmail.created_at)
+    if order == 'asc':
+        query = query.order_by(sort_column.asc(), RegisteredEmail.id.asc())
     else:
-        emails = RegisteredEmail.query.join(User).filter(User.role != 'owner').all()
-    return render_template('admin/emails.html', emails=emails)
+        query = query.order_by(sort_column.desc(), RegisteredEmail.id.desc())
+
+    pagination = query.paginate(per_page=ADMIN_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False)
+    domains = sorted(get_domain_catalogue().all, key=lambda d: d.domain)
+    return render_template('admin/emails.html',
+                           emails=pagination.items,
+                           pagination=pagination,
+                           domains=domains,
+                           domain_id=domain_id,
+                           owner_uid=owner_uid,
+                           status=status,
+                           address=address,
+                           sort=sort,
+                           order=order)
 
 
 @app.route('/admin/emails/disable/<int:email_id>')
@@ -1766,6 +2692,7 @@ def admin_disable_email(email_id):
         flash('无权操作此邮箱', 'danger')
         return redirect(url_for('admin_emails'))
     email.is_disabled = True
+    bump_data_version(email.user_id)
     db.session.commit()
     flash('邮箱已禁用', 'success')
 
@@ -1784,6 +2711,7 @@ def admin_enable_email(email_id):
         flash('无权操作此邮箱', 'danger')
         return redirect(url_for('admin_emails'))
     email.is_disabled = False
+    bump_data_version(email.user_id)
     db.session.commit()
     flash('邮箱已启用', 'success')
 
@@ -1801,6 +2729,7 @@ def admin_delete_email(email_id):
     if not current_user.is_owner() and email.owner.role == 'owner':
         flash('无权操作此邮箱', 'danger')
         return redirect(url_for('admin_emails'))
+    bump_data_version(email.user_id)
     db.session.delete(email)
     db.session.commit()
     flash('邮箱已删除', 'success')
@@ -1808,7 +2737,43 @@ def admin_delete_email(email_id):
     return redirect(url_for('admin_emails'))
 
 
+def bulk_set_email_disabled(ids, disabled):
+    bump_email_owners(RegisteredEmail.id.in_(ids))
+    return db.session.execute(
+        db.update(RegisteredEmail).where(RegisteredEmail.id.in_(ids)).values(is_disabled=disabled),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+
+def bulk_delete_emails(ids):
+    bump_email_owners(RegisteredEmail.id.in_(ids))
+    return db.session.execute(
+        db.delete(RegisteredEmail).where(RegisteredEmail.id.in_(ids)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+
+BULK_EMAIL_ACTIONS = {
+    'disable': lambda ids: bulk_set_email_disabled(ids, True),
+    'enable': lambda ids: bulk_set_email_disabled(ids, False),
+    'delete': lambda ids: bulk_delete_emails(ids),
+}
+
+
+@app.route('/admin/emails/bulk', methods=['POST'])
+@login_required
+def admin_bulk_emails():
+    if not current_user.is_owner():
+        return jsonify({'error': '无权访问'}), 403
+
+    action = BULK_EMAIL_ACTIONS.get(request.form.get('action'))
+    if not action:
+        return jsonify({'error': '无效的操作'}), 400
+    return run_bulk_action(RegisteredEmail, email_list_filters, action)
+
+
 @app.route('/admin/announcements')
+@read_replica
 @login_required
 def admin_announcements():
     if not current_user.is_owner():
@@ -1830,6 +2795,7 @@ def admin_add_announcement():
     content = request.form['content']
     announcement = Announcement(title=title, content=content)
     db.session.add(announcement)
+    cache.bump('announcements')
     db.session.commit()
     flash('公告添加成功', 'success')
 
@@ -1845,6 +2811,7 @@ def admin_toggle_announcement(announcement_id):
 
     announcement = Announcement.query.get_or_404(announcement_id)
     announcement.is_active = not announcement.is_active
+    cache.bump('announcements')
     db.session.commit()
     flash('公告状态已更新', 'success')
 
@@ -1860,6 +2827,7 @@ def admin_delete_announcement(announcement_id):
 
     announcement = Announcement.query.get_or_404(announcement_id)
     db.session.delete(announcement)
+    cache.bump('announcements')
     db.session.commit()
     flash('公告已删除', 'success')
 
@@ -1895,6 +2863,7 @@ def admin_settings():
             settings.imap_server = request.form['imap_server']
             settings.pop3_server = request.form['pop3_server']
             settings.webmail_url = request.form['webmail_url']
+        cache.bump('site_settings')
         db.session.commit()
         flash('站点设置已更新', 'success')
 
@@ -1902,14 +2871,16 @@ def admin_settings():
 
 
 @app.route('/admin/tickets')
+@read_replica
 @login_required
 def admin_tickets():
     if not current_user.can_access_admin():
         flash('无权访问', 'danger')
         return redirect(url_for('dashboard'))
 
-    tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-    return render_template('admin/tickets.html', tickets=tickets)
+    status = request.args.get('status', '')
+    pagination = ticket_list_query(status).paginate(per_page=ADMIN_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False)
+    return render_template('admin/tickets.html', tickets=pagination.items, pagination=pagination, status=status)
 
 
 @app.route('/admin/about', methods=['GET', 'POST'])
@@ -1927,6 +2898,7 @@ def admin_about():
 
     if request.method == 'POST':
         about_page.content = request.form['content']
+        cache.bump('about_page')
         db.session.commit()
         flash('关于页面已更新', 'success')
 
@@ -1948,6 +2920,7 @@ def admin_agreement():
 
     if request.method == 'POST':
         user_agreement.content = request.form['content']
+        cache.bump('user_agreement')
         db.session.commit()
         flash('用户协议已更新', 'success')
 
@@ -1955,13 +2928,16 @@ def admin_agreement():
 
 
 @app.route('/agreement')
+@read_replica
 def agreement():
-    user_agreement = UserAgreement.query.first()
-    if not user_agreement:
-        user_agreement = UserAgreement()
-        db.session.add(user_agreement)
-        db.session.commit()
-    return render_template('agreement.html', user_agreement=user_agreement)
+    def render():
+        user_agreement = UserAgreement.query.first()
+        if not user_agreement:
+            user_agreement = UserAgreement()
+            db.session.add(user_agreement)
+            db.session.commit()
+        return render_template('agreement.html', user_agreement=user_agreement)
+    return cached_public_page('user_agreement', render)
 
 
 @app.route('/admin/users/change-role/<int:user_id>', methods=['POST'])
@@ -1985,7 +2961,7 @@ def admin_change_role(user_id):
 
     user.role = new_role
     
-    site_settings = SiteSettings.query.first()
+    site_settings = get_site_settings()
     if new_role == 'user':
         user.max_emails = site_settings.default_user_max_emails if site_settings else 2
     elif new_role == 'pro':
@@ -2032,21 +3008,53 @@ def admin_update_max_emails(user_id):
     return redirect(url_for('admin_users'))
 
 
+def code_list_filters(args):
+    """卡密管理列表与导出共用的筛选条件。"""
+    criteria = []
+    search = args.get('search', '').strip()
+    status = args.get('status', '')
+    code_type = args.get('type', '')
+    if search:
+        criteria.append(RedemptionCode.code.startswith(search.upper(), autoescape=True))
+    
+    now = datetime.utcnow()
+    if status == 'used':
+        criteria.append(RedemptionCode.is_used == True)
+    elif status == 'expired':
+        criteria.append(RedemptionCode.expires_at < now)
+    elif status == 'available':
+        criteria.append(RedemptionCode.is_used == False)
+        criteria.append((RedemptionCode.expires_at.is_(None)) | (RedemptionCode.expires_at >= now))
+    
+    if code_type == 'permanent':
+        criteria.append(RedemptionCode.is_permanent == True)
+    elif code_type == 'temporary':
+        criteria.append(RedemptionCode.is_permanent == False)
+    return criteria
+
+
 @app.route('/admin/codes')
+@read_replica
 @login_required
 def admin_codes():
     if not current_user.can_access_admin():
         flash('无权访问', 'danger')
         return redirect(url_for('dashboard'))
 
-    search = request.args.get('search', '')
-    query = RedemptionCode.query
+    search = request.args.get('search', '').strip()
+    status = request.args.get('status', '')
+    code_type = request.args.get('type', '')
+    query = RedemptionCode.query.options(db.joinedload(RedemptionCode.user)).filter(*code_list_filters(request.args))
     
-    if search:
-        query = query.filter(RedemptionCode.code.like(f'%{search}%'))
-    
-    codes = query.order_by(RedemptionCode.created_at.desc()).all()
-    return render_template('admin/codes.html', codes=codes, search=search)
+    pagination = query.order_by(RedemptionCode.created_at.desc(), RedemptionCode.id.desc()).paginate(
+        per_page=ADMIN_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False
+    )
+    return render_template('admin/codes.html',
+                           codes=pagination.items,
+                           pagination=pagination,
+                           search=search,
+                           status=status,
+                           code_type=code_type)
 
 
 @app.route('/admin/codes/create', methods=['GET', 'POST'])
@@ -2069,41 +3077,130 @@ def admin_create_code():
             flash('批量生成时不能使用自定义卡密', 'danger')
             return redirect(url_for('admin_create_code'))
 
-        created_codes = []
-        for _ in range(count):
-            if custom_code:
-                code = custom_code
-            else:
-                code = RedemptionCode.generate_code()
-            
-            while RedemptionCode.query.filter_by(code=code).first():
-                code = RedemptionCode.generate_code()
-
-            redemption_code = RedemptionCode(
-                code=code,
-                extra_emails=extra_emails,
-                is_permanent=is_permanent,
-                max_uses=max_uses
-            )
-            
-            if not is_permanent and duration:
-                redemption_code.duration_days = int(duration)
-            
-            if expires_days > 0:
-                redemption_code.expires_at = datetime.utcnow() + timedelta(days=expires_days)
-
-            db.session.add(redemption_code)
-            created_codes.append(code)
+        if count < 1 or count > CODE_BULK_MAX:
+            flash(f'生成数量必须在 1 到 {CODE_BULK_MAX} 之间', 'danger')
+            return redirect(url_for('admin_create_code'))
 
-        db.session.commit()
-        flash(f'成功创建 {len(created_codes)} 个卡密！', 'success')
+        fields = {
+            'extra_emails': extra_emails,
+            'is_permanent': is_permanent,
+            'max_uses': max_uses,
+            'duration_days': int(duration) if not is_permanent and duration else None,
+            'expires_at': datetime.utcnow() + timedelta(days=expires_days) if expires_days > 0 else None
+        }
+        batch_id = generate_redemption_codes(count, fields, custom_code=custom_code or None)
+        flash(f'成功创建 {count} 个卡密！', 'success')
         
-        if len(created_codes) == 1:
+        if count == 1:
             return redirect(url_for('admin_codes'))
         else:
-            return render_template('admin/show_codes.html', codes=created_codes)
+            return redirect(url_for('admin_code_batch', batch_id=batch_id))
+
+    return render_template('admin/create_code.html', max_count=CODE_BULK_MAX)
+
+
+def generate_redemption_codes(count, fields, custom_code=None, batch_size=CODE_BATCH_SIZE):
+    """在内存中生成卡密，每批用一次 IN 查询排除已存在的卡密，再以多行 INSERT 写入。"""
+    batch_id = secrets.token_hex(16)
+    now = datetime.utcnow()
+    remaining = count
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        codes = {custom_code} if custom_code else set()
+        while True:
+            while len(codes) < size:
+                codes.add(RedemptionCode.generate_code())
+            existing = set(db.session.execute(
+                db.select(RedemptionCode.code).where(RedemptionCode.code.in_(codes))
+            ).scalars())
+            if not existing:
+                break
+            codes -= existing
+        custom_code = None
+        db.session.execute(RedemptionCode.__table__.insert(), [
+            dict(fields, code=code, batch_id=batch_id, used_count=0, is_used=False, created_at=now)
+            for code in codes
+        ])
+        db.session.commit()
+        remaining -= size
+    return batch_id
+
+
+def iter_code_batch(batch_id, chunk_size=CODE_BATCH_SIZE):
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(RedemptionCode.id, RedemptionCode.code)
+            .where(RedemptionCode.batch_id == batch_id, RedemptionCode.id > last_id)
+            .order_by(RedemptionCode.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1].id
 
-    return render_template('admin/create_code.html')
+
+@app.route('/admin/codes/batch/<batch_id>')
+@login_required
+def admin_code_batch(batch_id):
+    if not current_user.can_access_admin():
+        flash('无权访问', 'danger')
+        return redirect(url_for('dashboard'))
+
+    total = RedemptionCode.query.filter_by(batch_id=batch_id).count()
+    if not total:
+        flash('该批次卡密不存在', 'danger')
+        return redirect(url_for('admin_codes'))
+    preview = [row.code for row in next(iter_code_batch(batch_id, CODE_PREVIEW_LIMIT), [])]
+    return render_template('admin/show_codes.html', codes=preview, total=total, batch_id=batch_id)
+
+
+@app.route('/admin/codes/batch/<batch_id>/download')
+@login_required
+def admin_download_code_batch(batch_id):
+    if not current_user.can_access_admin():
+        flash('无权访问', 'danger')
+        return redirect(url_for('dashboard'))
+
+    file_format = request.args.get('format', 'txt')
+
+    def generate():
+        if file_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['code', 'extra_emails', 'duration_days', 'is_permanent', 'max_uses', 'expires_at'])
+            columns = (RedemptionCode.id, RedemptionCode.code, RedemptionCode.extra_emails, RedemptionCode.duration_days,
+                       RedemptionCode.is_permanent, RedemptionCode.max_uses, RedemptionCode.expires_at)
+            last_id = 0
+            while True:
+                rows = db.session.execute(
+                    db.select(*columns)
+                    .where(RedemptionCode.batch_id == batch_id, RedemptionCode.id > last_id)
+                    .order_by(RedemptionCode.id)
+                    .limit(CODE_BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+                writer.writerows(
+                    (r.code, r.extra_emails, r.duration_days or '', int(bool(r.is_permanent)), r.max_uses,
+                     r.expires_at.strftime('%Y-%m-%d %H:%M:%S') if r.expires_at else '')
+                    for r in rows
+                )
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                last_id = rows[-1].id
+        else:
+            for rows in iter_code_batch(batch_id):
+                yield ''.join(f'{row.code}\n' for row in rows)
+
+    extension = 'csv' if file_format == 'csv' else 'txt'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv' if extension == 'csv' else 'text/plain',
+        headers={'Content-Disposition': f'attachment; filename=codes_{batch_id[:8]}.{extension}'}
+    )
 
 
 @app.route('/admin/codes/delete/<int:code_id>')
@@ -2155,14 +3252,38 @@ def admin_cleanup_codes():
 
 
 @app.route('/admin/prefix-blacklist')
+@read_replica
 @login_required
 def admin_prefix_blacklist():
     if not current_user.is_owner():
         flash('无权访问此页面', 'danger')
         return redirect(url_for('admin_dashboard'))
     
-    blacklist = PrefixBlacklist.query.order_by(PrefixBlacklist.created_at.desc()).all()
-    return render_template('admin/prefix_blacklist.html', blacklist=blacklist)
+    pagination = PrefixBlacklist.query.order_by(PrefixBlacklist.created_at.desc(), PrefixBlacklist.id.desc()).paginate(
+        per_page=ADMIN_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False
+    )
+    return render_template('admin/prefix_blacklist.html',
+                           blacklist=pagination.items,
+                           pagination=pagination,
+                           match_types=BLACKLIST_MATCH_TYPES)
+
+
+def normalize_blacklist_entry(prefix, match_type):
+    prefix = (prefix or '').strip()
+    match_type = match_type or 'prefix'
+    if not prefix:
+        raise ValueError('请输入前缀')
+    if match_type not in BLACKLIST_MATCH_TYPES:
+        raise ValueError('无效的匹配方式')
+    if match_type == 'regex':
+        # 正则按原样保存，匹配时忽略大小写
+        try:
+            re.compile(prefix)
+        except re.error:
+            raise ValueError('无效的正则表达式')
+    else:
+        prefix = prefix.lower()
+    return prefix, match_type
 
 
 @app.route('/admin/prefix-blacklist/add', methods=['POST'])
@@ -2172,9 +3293,10 @@ def admin_add_prefix_blacklist():
         flash('无权访问此页面', 'danger')
         return redirect(url_for('admin_dashboard'))
     
-    prefix = request.form.get('prefix', '').strip().lower()
-    if not prefix:
-        flash('请输入前缀', 'danger')
+    try:
+        prefix, match_type = normalize_blacklist_entry(request.form.get('prefix', ''), request.form.get('match_type', 'prefix'))
+    except ValueError as e:
+        flash(str(e), 'danger')
         return redirect(url_for('admin_prefix_blacklist'))
     
     existing = PrefixBlacklist.query.filter_by(prefix=prefix).first()
@@ -2182,8 +3304,9 @@ def admin_add_prefix_blacklist():
         flash('该前缀已在黑名单中', 'danger')
         return redirect(url_for('admin_prefix_blacklist'))
     
-    blacklist_item = PrefixBlacklist(prefix=prefix)
+    blacklist_item = PrefixBlacklist(prefix=prefix, match_type=match_type)
     db.session.add(blacklist_item)
+    cache.bump('prefix_blacklist')
     db.session.commit()
     
     flash(f'前缀 "{prefix}" 已添加到黑名单', 'success')
@@ -2199,6 +3322,7 @@ def admin_delete_prefix_blacklist(item_id):
     
     item = PrefixBlacklist.query.get_or_404(item_id)
     db.session.delete(item)
+    cache.bump('prefix_blacklist')
     db.session.commit()
     
     flash(f'前缀 "{item.prefix}" 已从黑名单中删除', 'success')
@@ -2206,6 +3330,7 @@ def admin_delete_prefix_blacklist(item_id):
 
 
 @app.route('/admin/email-suffixes')
+@read_replica
 @login_required
 def admin_email_suffixes():
     if not current_user.is_owner():
@@ -2216,6 +3341,17 @@ def admin_email_suffixes():
     return render_template('admin/email_suffixes.html', suffixes=suffixes)
 
 
+def normalize_email_suffix(suffix):
+    suffix = (suffix or '').strip().lower()
+    if not suffix:
+        raise ValueError('请输入邮箱后缀')
+    if not suffix.startswith('@'):
+        suffix = '@' + suffix
+    if '*' in suffix and (not suffix.startswith('@*.') or '*' in suffix[3:]):
+        raise ValueError('通配后缀格式应为 @*.example.com')
+    return suffix
+
+
 @app.route('/admin/email-suffixes/add', methods=['POST'])
 @login_required
 def admin_add_email_suffix():
@@ -2223,14 +3359,12 @@ def admin_add_email_suffix():
         flash('无权访问此页面', 'danger')
         return redirect(url_for('admin_dashboard'))
     
-    suffix = request.form.get('suffix', '').strip().lower()
-    if not suffix:
-        flash('请输入邮箱后缀', 'danger')
+    try:
+        suffix = normalize_email_suffix(request.form.get('suffix', ''))
+    except ValueError as e:
+        flash(str(e), 'danger')
         return redirect(url_for('admin_email_suffixes'))
     
-    if not suffix.startswith('@'):
-        suffix = '@' + suffix
-    
     existing = AllowedEmailSuffix.query.filter_by(suffix=suffix).first()
     if existing:
         flash('该邮箱后缀已存在', 'danger')
@@ -2238,6 +3372,7 @@ def admin_add_email_suffix():
     
     suffix_item = AllowedEmailSuffix(suffix=suffix)
     db.session.add(suffix_item)
+    cache.bump('allowed_email_suffixes')
     db.session.commit()
     
     flash(f'邮箱后缀 "{suffix}" 已添加到允许列表', 'success')
@@ -2253,12 +3388,619 @@ def admin_delete_email_suffix(item_id):
     
     item = AllowedEmailSuffix.query.get_or_404(item_id)
     db.session.delete(item)
+    cache.bump('allowed_email_suffixes')
     db.session.commit()
     
     flash(f'邮箱后缀 "{item.suffix}" 已从允许列表中删除', 'success')
     return redirect(url_for('admin_email_suffixes'))
 
 
+def export_ticket_filters(args):
+    status = args.get('status', '')
+    if status in ('open', 'closed'):
+        return [Ticket.status == status]
+    return []
+
+
+def export_reply_filters(args):
+    status = args.get('status', '')
+    if status in ('open', 'closed'):
+        return [TicketReply.ticket_id.in_(db.select(Ticket.id).where(Ticket.status == status))]
+    return []
+
+
+# 导出类型：(主键列, 导出列, 关联表, 筛选条件, 是否仅限站长)
+EXPORTS = {
+    'users': (User.id, (
+        User.id, User.uid, User.username, User.email, User.role, User.is_verified, User.is_banned,
+        User.max_emails, User.extra_emails, User.temp_extra_emails, User.temp_expires_at, User.created_at
+    ), (), user_list_filters, False),
+    'emails': (RegisteredEmail.id, (
+        RegisteredEmail.id, RegisteredEmail.email_address, Domain.domain.label('domain'),
+        User.uid.label('owner_uid'), User.username.label('owner_username'),
+        RegisteredEmail.is_disabled, RegisteredEmail.created_at
+    ), ((User, RegisteredEmail.user_id == User.id), (Domain, RegisteredEmail.domain_id == Domain.id)),
+        email_list_filters, True),
+    'codes': (RedemptionCode.id, (
+        RedemptionCode.id, RedemptionCode.code, RedemptionCode.extra_emails, RedemptionCode.duration_days,
+        RedemptionCode.is_permanent, RedemptionCode.max_uses, RedemptionCode.used_count, RedemptionCode.is_used,
+        RedemptionCode.expires_at, User.username.label('used_by'), RedemptionCode.used_at,
+        RedemptionCode.batch_id, RedemptionCode.created_at
+    ), ((User, RedemptionCode.user_id == User.id),), code_list_filters, False),
+    'tickets': (Ticket.id, (
+        Ticket.id, Ticket.title, User.uid.label('user_uid'), User.username, Ticket.status,
+        Ticket.reply_count, Ticket.last_reply_at, Ticket.created_at, Ticket.closed_at
+    ), ((User, Ticket.user_id == User.id),), export_ticket_filters, False),
+    'ticket_replies': (TicketReply.id, (
+        TicketReply.id, TicketReply.ticket_id, User.uid.label('user_uid'), User.username,
+        TicketReply.is_admin, TicketReply.content, TicketReply.created_at
+    ), ((User, TicketReply.user_id == User.id),), export_reply_filters, False),
+}
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 1000
+
+
+def iter_export_rows(kind, args, chunk_size=EXPORT_CHUNK_SIZE):
+    """按主键分块顺序读取导出数据，内存占用与表大小无关。"""
+    key, columns, joins, filters, _ = EXPORTS[kind]
+    stmt = db.select(*columns)
+    for target, onclause in joins:
+        stmt = stmt.outerjoin(target, onclause)
+    stmt = stmt.where(*filters(args)).order_by(key).limit(chunk_size)
+    last_key = None
+    while True:
+        chunk_stmt = stmt if last_key is None else stmt.where(key > last_key)
+        rows = db.session.execute(chunk_stmt.execution_options(stream_results=True)).all()
+        if not rows:
+            break
+        yield rows
+        last_key = rows[-1].id
+
+
+def format_export_value(value, fmt):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if fmt == 'csv':
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return int(value)
+    return value
+
+
+def iter_export(kind, args, fmt='csv', compress=False):
+    """以 CSV 或 JSONL 逐块生成导出内容，可选实时 gzip 压缩。"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    fields = [column.key for column in EXPORTS[kind][1]]
+    if fmt == 'csv':
+        writer.writerow(fields)
+
+    for rows in iter_export_rows(kind, args):
+        for row in rows:
+            values = [format_export_value(value, fmt) for value in row]
+            if fmt == 'csv':
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False))
+                buffer.write('\n')
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        yield compressor.compress(data) if compressor else data
+
+    if fmt == 'csv' and buffer.tell():
+        data = buffer.getvalue().encode('utf-8')
+        yield compressor.compress(data) if compressor else data
+    if compressor:
+        yield compressor.flush()
+
+
+@app.route('/admin/export/<kind>')
+@read_replica
+@login_required
+def admin_export(kind):
+    if kind not in EXPORTS:
+        flash('不支持的导出类型', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if not current_user.can_access_admin() or (EXPORTS[kind][4] and not current_user.is_owner()):
+        flash('无权访问', 'danger')
+        return redirect(url_for('dashboard'))
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+    compress = request.args.get('gzip') == '1'
+    filename = f'{kind}_{datetime.utcnow().strftime("%Y%m%d%H%M%S")}.{fmt}'
+    if compress:
+        filename += '.gz'
+    return Response(
+        stream_with_context(iter_export(kind, request.args, fmt, compress)),
+        mimetype='application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson'),
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(list(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv', help='导出格式')
+@click.option('--gzip', 'compress', is_flag=True, help='使用 gzip 压缩输出')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='输出文件，默认写到标准输出')
+@click.option('--filter', 'filters', multiple=True, metavar='KEY=VALUE', help='与管理后台列表相同的筛选参数')
+def export_command(kind, fmt, compress, output, filters):
+    """导出用户、邮箱、卡密或工单数据。"""
+    args = MultiDict(item.split('=', 1) for item in filters if '=' in item)
+    stream = open(output, 'wb') if output else click.get_binary_stream('stdout')
+    try:
+        for chunk in iter_export(kind, args, fmt, compress):
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_BATCH_SIZE = 1000
+IMPORT_ERROR_DISPLAY = 500
+IMPORT_USER_ROLES = ('user', 'pro', 'admin')
+
+
+def iter_import_file(stream, fmt, compressed=False):
+    """逐行解析上传的 CSV/JSONL 文件，产出 (行号, 记录, 错误)。"""
+    if compressed:
+        stream = gzip.GzipFile(fileobj=stream)
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, {(k or '').strip(): v for k, v in record.items()}, None
+    else:
+        for line_no, line in enumerate(text_stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, '不是有效的 JSON'
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, '每行必须是 JSON 对象'
+                continue
+            yield line_no, record, None
+
+
+def import_value(record, field, default=None):
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    return default if value is None or value == '' else value
+
+
+def import_bool(record, field, default=False):
+    value = import_value(record, field)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if str(value).lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f'{field} 不是有效的布尔值')
+
+
+def import_int(record, field, default=None):
+    value = import_value(record, field)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} 不是有效的整数')
+
+
+def import_datetime(record, field, default=None):
+    value = import_value(record, field)
+    if value is None:
+        return default
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'{field} 不是有效的时间')
+
+
+def prepare_import_domain(record):
+    # 与后台添加的域名一致，以 @ 开头保存（邮箱地址为 前缀 + 域名）
+    domain = (import_value(record, 'domain') or '').strip().lower().lstrip('@')
+    if not domain:
+        raise ValueError('缺少 domain')
+    return {'domain': f'@{domain}', 'is_active': import_bool(record, 'is_active', True),
+            'created_at': import_datetime(record, 'created_at', datetime.utcnow())}
+
+
+def prepare_import_blacklist(record):
+    prefix, match_type = normalize_blacklist_entry(import_value(record, 'prefix'), import_value(record, 'match_type'))
+    return {'prefix': prefix, 'match_type': match_type,
+            'created_at': import_datetime(record, 'created_at', datetime.utcnow())}
+
+
+def prepare_import_suffix(record):
+    return {'suffix': normalize_email_suffix(import_value(record, 'suffix')),
+            'created_at': import_datetime(record, 'created_at', datetime.utcnow())}
+
+
+def prepare_import_user(record):
+    username = import_value(record, 'username')
+    email = import_value(record, 'email')
+    if not username or not email:
+        raise ValueError('缺少 username 或 email')
+    if '@' not in email:
+        raise ValueError('email 格式无效')
+    password_hash = import_value(record, 'password_hash')
+    if not password_hash:
+        password = import_value(record, 'password')
+        if not password:
+            raise ValueError('缺少 password_hash 或 password')
+        password_hash = generate_password_hash(password)
+    role = import_value(record, 'role', 'user')
+    if role not in IMPORT_USER_ROLES:
+        raise ValueError(f'不支持导入用户组 {role}')
+    site_settings = get_site_settings()
+    uid = import_value(record, 'uid')
+    return {
+        'uid': str(uid) if uid else generate_uid(),
+        '_generated_uid': not uid,
+        'username': username,
+        'email': email,
+        'password_hash': password_hash,
+        'role': role,
+        'is_admin': False,
+        'is_verified': import_bool(record, 'is_verified', True),
+        'is_banned': import_bool(record, 'is_banned', False),
+        'max_emails': import_int(record, 'max_emails', site_settings.default_user_max_emails if site_settings else 2),
+        'extra_emails': import_int(record, 'extra_emails', 0),
+        'temp_extra_emails': import_int(record, 'temp_extra_emails', 0),
+        'temp_expires_at': import_datetime(record, 'temp_expires_at'),
+        'created_at': import_datetime(record, 'created_at', datetime.utcnow())
+    }
+
+
+def prepare_import_email(record):
+    address = (import_value(record, 'email_address') or '').lower()
+    prefix, _, domain_name = address.partition('@')
+    if not prefix or not domain_name:
+        raise ValueError('email_address 格式无效')
+    domain = get_domain_catalogue().get_by_name(f'@{domain_name}')
+    if not domain:
+        raise ValueError(f'域名 @{domain_name} 不存在')
+    password = import_value(record, 'email_password')
+    if not password:
+        raise ValueError('缺少 email_password')
+    owner_uid = import_value(record, 'owner_uid')
+    owner_username = import_value(record, 'owner_username')
+    if not owner_uid and not owner_username:
+        raise ValueError('缺少 owner_uid 或 owner_username')
+    return {
+        'email_address': address,
+        'email_password': password,
+        'prefix': prefix,
+        'domain_id': domain.id,
+        '_owner': ('uid', str(owner_uid)) if owner_uid else ('username', owner_username),
+        'is_disabled': import_bool(record, 'is_disabled', False),
+        'created_at': import_datetime(record, 'created_at', datetime.utcnow())
+    }
+
+
+def resolve_import_email_owners(rows):
+    """按批次查出邮箱所属用户，返回无法解析的行。"""
+    rejected = {}
+    for field in ('uid', 'username'):
+        values = {row['_owner'][1] for _, row in rows if row['_owner'][0] == field}
+        if not values:
+            continue
+        column = getattr(User, field)
+        owners = dict(db.session.execute(db.select(column, User.id).where(column.in_(values))).all())
+        for line, row in rows:
+            if row['_owner'][0] == field:
+                if row['_owner'][1] in owners:
+                    row['user_id'] = owners[row['_owner'][1]]
+                else:
+                    rejected[line] = f'用户 {row["_owner"][1]} 不存在'
+    return rejected
+
+
+def touch_imported_email_owners(rows):
+    bump_data_version(*{row['user_id'] for _, row in rows})
+
+
+def index_imported_users(rows):
+    user_ids = dict(db.session.execute(
+        db.select(User.username, User.id).where(User.username.in_([row['username'] for _, row in rows]))
+    ).all())
+    connection = db.session.connection()
+    for _, row in rows:
+        index_user_search(connection, user_ids[row['username']], row['username'], row['email'])
+
+
+# 导入类型：(模型, 唯一键字段, 行校验, 批次解析, 写入后处理, 需刷新的缓存)
+IMPORTS = {
+    'domains': (Domain, ('domain',), prepare_import_domain, None, None, 'domains'),
+    'prefix_blacklist': (PrefixBlacklist, ('prefix',), prepare_import_blacklist, None, None, 'prefix_blacklist'),
+    'email_suffixes': (AllowedEmailSuffix, ('suffix',), prepare_import_suffix, None, None, 'allowed_email_suffixes'),
+    'users': (User, ('uid', 'username', 'email'), prepare_import_user, None, index_imported_users, None),
+    'emails': (RegisteredEmail, ('email_address',), prepare_import_email, resolve_import_email_owners, touch_imported_email_owners, None),
+}
+
+
+def fold_import_key(value):
+    # MySQL 默认排序规则不区分大小写，唯一键按折叠后的值判重
+    return value.casefold() if isinstance(value, str) else value
+
+
+def import_records(kind, records, on_error, batch_size=IMPORT_BATCH_SIZE):
+    """分批校验并以多行 INSERT 写入导入记录，每批一个事务，被拒绝的行交给 on_error。"""
+    model, keys, prepare, resolve, after_insert, cache_name = IMPORTS[kind]
+    seen = {key: set() for key in keys}
+    stats = {'inserted': 0, 'rejected': 0}
+
+    def reject(line, reason):
+        stats['rejected'] += 1
+        on_error(line, reason)
+
+    def flush(batch):
+        if resolve:
+            rejected = resolve(batch)
+            for line, reason in rejected.items():
+                reject(line, reason)
+            batch = [item for item in batch if item[0] not in rejected]
+        for key in keys:
+            column = getattr(model, key)
+            while batch:
+                existing = {fold_import_key(value) for value in db.session.execute(
+                    db.select(column).where(column.in_([row[key] for _, row in batch]))
+                ).scalars()}
+                if not existing:
+                    break
+                kept = []
+                for line, row in batch:
+                    if fold_import_key(row[key]) not in existing:
+                        kept.append((line, row))
+                    elif key == 'uid' and row['_generated_uid']:
+                        row['uid'] = generate_uid()
+                        kept.append((line, row))
+                    else:
+                        reject(line, f'{key} 已存在: {row[key]}')
+                batch = kept
+        if not batch:
+            return
+        try:
+            insert(batch)
+        except IntegrityError:
+            # 数据库判定的重复（如排序规则忽略重音）无法预先排除，回滚后逐行写入以定位冲突的行
+            db.session.rollback()
+            for item in batch:
+                try:
+                    insert([item])
+                except IntegrityError as e:
+                    db.session.rollback()
+                    reject(item[0], f'与已有记录冲突: {e.orig}')
+
+    def insert(batch):
+        db.session.execute(model.__table__.insert(), [
+            {k: v for k, v in row.items() if not k.startswith('_')} for _, row in batch
+        ])
+        if after_insert:
+            after_insert(batch)
+        if cache_name:
+            cache.bump(cache_name)
+        db.session.commit()
+        stats['inserted'] += len(batch)
+
+    batch = []
+    for line, record, error in records:
+        if error:
+            reject(line, error)
+            continue
+        try:
+            row = prepare(record)
+        except ValueError as e:
+            reject(line, str(e))
+            continue
+        duplicate = next((key for key in keys if fold_import_key(row[key]) in seen[key]), None)
+        if duplicate:
+            reject(line, f'{duplicate} 在文件中重复: {row[duplicate]}')
+            continue
+        for key in keys:
+            seen[key].add(fold_import_key(row[key]))
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+    return stats
+
+
+@app.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+def admin_import():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        fmt = request.form.get('format', 'csv')
+        upload = request.files.get('file')
+        if kind not in IMPORTS or fmt not in IMPORT_FORMATS or not upload or not upload.filename:
+            flash('请选择导入类型、格式和文件', 'danger')
+            return redirect(url_for('admin_import'))
+
+        errors = []
+
+        def on_error(line, reason):
+            if len(errors) < IMPORT_ERROR_DISPLAY:
+                errors.append((line, reason))
+
+        records = iter_import_file(upload.stream, fmt, upload.filename.endswith('.gz'))
+        try:
+            stats = import_records(kind, records, on_error)
+        except UnicodeDecodeError:
+            db.session.rollback()
+            flash('文件编码必须为 UTF-8', 'danger')
+            return redirect(url_for('admin_import'))
+        flash(f'导入完成：成功 {stats["inserted"]} 行，拒绝 {stats["rejected"]} 行', 'success' if not stats['rejected'] else 'warning')
+        return render_template('admin/import.html', kinds=IMPORTS, formats=IMPORT_FORMATS, kind=kind, fmt=fmt,
+                               stats=stats, errors=errors, error_limit=IMPORT_ERROR_DISPLAY)
+
+    return render_template('admin/import.html', kinds=IMPORTS, formats=IMPORT_FORMATS, kind=None, fmt='csv',
+                           stats=None, errors=[], error_limit=IMPORT_ERROR_DISPLAY)
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(list(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None, help='文件格式，默认按扩展名判断')
+@click.option('--report', type=click.Path(dir_okay=False), help='被拒绝行的错误报告 CSV')
+def import_command(kind, path, fmt, report):
+    """从 CSV/JSONL 文件批量导入用户、邮箱、域名、黑名单或邮箱后缀。"""
+    compressed = path.endswith('.gz')
+    fmt = fmt or ('jsonl' if path.removesuffix('.gz').endswith(('.jsonl', '.json')) else 'csv')
+    report_file = open(report, 'w', newline='', encoding='utf-8') if report else None
+    report_writer = csv.writer(report_file) if report_file else None
+    if report_writer:
+        report_writer.writerow(['line', 'error'])
+
+    def on_error(line, reason):
+        if report_writer:
+            report_writer.writerow([line, reason])
+        else:
+            click.echo(f'第 {line} 行: {reason}', err=True)
+
+    try:
+        with open(path, 'rb') as stream:
+            stats = import_records(kind, iter_import_file(stream, fmt, compressed), on_error)
+    finally:
+        if report_file:
+            report_file.close()
+    click.echo(f'导入完成：成功 {stats["inserted"]} 行，拒绝 {stats["rejected"]} 行')
+
+
+OUTBOX_STATUSES = {
+    'pending': '等待发送',
+    'sending': '发送中',
+    'sent': '已发送',
+    'failed': '发送失败',
+}
+
+
+@app.route('/admin/outbox')
+@read_replica
+@login_required
+def admin_outbox():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    status = request.args.get('status', '')
+    query = EmailOutbox.query
+    if status in OUTBOX_STATUSES:
+        query = query.filter(EmailOutbox.status == status)
+    pagination = query.order_by(EmailOutbox.created_at.desc(), EmailOutbox.id.desc()).paginate(
+        per_page=ADMIN_PAGE_SIZE, max_per_page=ADMIN_MAX_PAGE_SIZE, error_out=False
+    )
+    counts = dict(db.session.execute(
+        db.select(EmailOutbox.status, db.func.count()).group_by(EmailOutbox.status)
+    ).all())
+    return render_template('admin/outbox.html',
+                           messages=pagination.items,
+                           pagination=pagination,
+                           status=status,
+                           statuses=OUTBOX_STATUSES,
+                           counts=counts,
+                           max_attempts=OUTBOX_MAX_ATTEMPTS)
+
+
+@app.route('/admin/outbox/retry', methods=['POST'])
+@login_required
+def admin_retry_outbox():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    query = EmailOutbox.query.filter(EmailOutbox.status == 'failed')
+    message_id = request.form.get('message_id', type=int)
+    if message_id:
+        query = query.filter(EmailOutbox.id == message_id)
+    count = query.update({
+        EmailOutbox.status: 'pending',
+        EmailOutbox.attempts: 0,
+        EmailOutbox.next_attempt_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    outbox_sender.wake()
+    flash(f'已重新排队 {count} 封邮件', 'success')
+    return redirect(url_for('admin_outbox'))
+
+
+@app.route('/admin/outbox/cleanup', methods=['POST'])
+@login_required
+def admin_cleanup_outbox():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    count = EmailOutbox.query.filter(
+        EmailOutbox.status == 'sent',
+        EmailOutbox.sent_at < datetime.utcnow() - timedelta(days=7)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    flash(f'已清理 {count} 封7天前发送的邮件', 'success')
+    return redirect(url_for('admin_outbox'))
+
+
+@app.route('/admin/rate-limits')
+@login_required
+def admin_rate_limits():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    rules = {endpoint: view.rate_limits for endpoint, view in app.view_functions.items() if hasattr(view, 'rate_limits')}
+    return render_template('admin/rate_limits.html',
+                           rules=rules,
+                           stats=rate_limiter.snapshot(),
+                           backend=RATE_LIMIT_BACKEND)
+
+
+@app.route('/admin/recaptcha')
+@login_required
+def admin_recaptcha():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    return render_template('admin/recaptcha.html',
+                           stats=recaptcha_verifier.snapshot(),
+                           enabled=RECAPTCHA_ENABLED and bool(RECAPTCHA_SECRET_KEY and RECAPTCHA_SITE_KEY),
+                           verify_url=RECAPTCHA_VERIFY_URL,
+                           max_timeout=RECAPTCHA_TIMEOUT,
+                           min_timeout=RECAPTCHA_MIN_TIMEOUT,
+                           pool_size=RECAPTCHA_POOL_SIZE)
+
+
+@app.route('/admin/db-pool')
+@login_required
+def admin_db_pool():
+    if not current_user.is_owner():
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    
+    return render_template('admin/db_pool.html',
+                           pools=pool_metrics.snapshot(),
+                           engine_options=app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+
+
 @app.route('/admin/about-system')
 @login_required
 def admin_about_system():
@@ -2275,6 +4017,8 @@ def admin_check_update():
     if not current_user.is_owner():
         flash('无权访问此页面', 'danger')
         return redirect(url_for('admin_dashboard'))
+
+    import requests
     
     update_info = None
     error_msg = None
@@ -2292,229 +4036,140 @@ def admin_check_update():
                            error_msg=error_msg)
 
 
+def redeem_code_for_user(code_str, user_id):
+    """用条件 UPDATE 领取一次使用次数并原子地增加配额，返回 (状态, 剩余次数)。"""
+    code = RedemptionCode.query.filter_by(code=code_str).first()
+    if not code:
+        return 'invalid', None
+    if code.is_expired():
+        return 'expired', None
+
+    now = datetime.utcnow()
+    claimed = RedemptionCode.query.filter(
+        RedemptionCode.id == code.id,
+        (RedemptionCode.expires_at.is_(None)) | (RedemptionCode.expires_at >= now),
+        (RedemptionCode.max_uses <= 0) | (RedemptionCode.used_count < RedemptionCode.max_uses)
+    ).update({
+        RedemptionCode.used_count: RedemptionCode.used_count + 1,
+        RedemptionCode.user_id: user_id,
+        RedemptionCode.used_at: now
+    }, synchronize_session=False)
+    if not claimed:
+        db.session.rollback()
+        return 'exhausted', None
+
+    RedemptionCode.query.filter(
+        RedemptionCode.id == code.id,
+        RedemptionCode.max_uses > 0,
+        RedemptionCode.used_count >= RedemptionCode.max_uses
+    ).update({RedemptionCode.is_used: True}, synchronize_session=False)
+
+    if code.is_permanent:
+        User.query.filter_by(id=user_id).update({
+            User.extra_emails: db.func.coalesce(User.extra_emails, 0) + code.extra_emails
+        }, synchronize_session=False)
+    elif code.duration_days:
+        new_expires_at = now + timedelta(days=code.duration_days)
+        User.query.filter_by(id=user_id).update({
+            User.temp_extra_emails: db.case(
+                (User.temp_expires_at > now, db.func.coalesce(User.temp_extra_emails, 0) + code.extra_emails),
+                else_=code.extra_emails
+            ),
+            User.temp_expires_at: db.case(
+                (User.temp_expires_at > new_expires_at, User.temp_expires_at),
+                else_=new_expires_at
+            )
+        }, synchronize_session=False)
+
+    used_count, max_uses = db.session.execute(
+        db.select(RedemptionCode.used_count, RedemptionCode.max_uses).where(RedemptionCode.id == code.id)
+    ).one()
+    db.session.commit()
+    return 'ok', (max_uses - used_count if max_uses > 0 else None)
+
+
 @app.route('/redeem-code', methods=['GET', 'POST'])
 @login_required
+@rate_limit(user=(10, 60), ip=(20, 60))
 def redeem_code():
     if request.method == 'POST':
         code_str = request.form['code'].strip().upper()
         
-        code = RedemptionCode.query.filter_by(code=code_str).first()
+        status, remaining = redeem_code_for_user(code_str, current_user.id)
         
-        if not code:
+        if status == 'invalid':
             flash('卡密无效', 'danger')
             return redirect(url_for('redeem_code'))
         
-        if code.is_expired():
+        if status == 'expired':
             flash('该卡密已过期', 'danger')
             return redirect(url_for('redeem_code'))
         
-        if not code.can_be_used():
+        if status == 'exhausted':
             flash('该卡密已达到最大使用次数', 'danger')
             return redirect(url_for('redeem_code'))
         
-        if code.is_permanent:
-            current_user.extra_emails += code.extra_emails
-        else:
-            if code.duration_days:
-                if current_user.temp_expires_at and current_user.temp_expires_at > datetime.utcnow():
-                    current_user.temp_extra_emails += code.extra_emails
-                    current_user.temp_expires_at = max(current_user.temp_expires_at, datetime.utcnow() + timedelta(days=code.duration_days))
-                else:
-                    current_user.temp_extra_emails = code.extra_emails
-                    current_user.temp_expires_at = datetime.utcnow() + timedelta(days=code.duration_days)
-        
-        code.used_count += 1
-        if code.max_uses > 0 and code.used_count >= code.max_uses:
-            code.is_used = True
-        code.user_id = current_user.id
-        code.used_at = datetime.utcnow()
-        
-        db.session.commit()
-        remaining = code.max_uses - code.used_count if code.max_uses > 0 else '无限'
-        flash(f'卡密兑换成功！剩余使用次数: {remaining}', 'success')
+        flash(f'卡密兑换成功！剩余使用次数: {remaining if remaining is not None else "无限"}', 'success')
         return redirect(url_for('dashboard'))
 
     return render_template('redeem_code.html')
 
 
-def init_db():
-    with app.app_context():
-        try:
-            inspector = db.inspect(db.engine)
-            existing_tables = inspector.get_table_names()
-            
-            if 'user' in existing_tables:
-                columns = [col['name'] for col in inspector.get_columns('user')]
-                new_columns = ['uid', 'role', 'max_emails', 'extra_emails', 'pro_expires_at', 'is_permanent', 'temp_extra_emails', 'temp_expires_at']
-                for col in new_columns:
-                    if col not in columns:
-                        try:
-                            with db.engine.connect() as conn:
-                                if col == 'uid':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN uid VARCHAR(20)"))
-                                elif col == 'role':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN role VARCHAR(20) DEFAULT 'user'"))
-                                elif col == 'max_emails':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN max_emails INT DEFAULT 2"))
-                                elif col == 'extra_emails':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN extra_emails INT DEFAULT 0"))
-                                elif col == 'pro_expires_at':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN pro_expires_at DATETIME"))
-                                elif col == 'is_permanent':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN is_permanent BOOLEAN DEFAULT FALSE"))
-                                elif col == 'temp_extra_emails':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN temp_extra_emails INT DEFAULT 0"))
-                                elif col == 'temp_expires_at':
-                                    conn.execute(db.text("ALTER TABLE user ADD COLUMN temp_expires_at DATETIME"))
-                                conn.execute(db.text("COMMIT"))
-                        except Exception as e:
-                            print(f"添加{col}列时出错: {e}")
-            
-            if 'site_settings' in existing_tables:
-                columns = [col['name'] for col in inspector.get_columns('site_settings')]
-                if 'site_url' not in columns:
-                    try:
-                        with db.engine.connect() as conn:
-                            conn.execute(db.text("ALTER TABLE site_settings ADD COLUMN site_url VARCHAR(200) DEFAULT 'http://localhost:5000'"))
-                            conn.execute(db.text("COMMIT"))
-                    except Exception as e:
-                        print(f"添加site_url列时出错: {e}")
-            
-            if 'redemption_code' in existing_tables:
-                columns = [col['name'] for col in inspector.get_columns('redemption_code')]
-                new_columns = ['max_uses', 'used_count', 'expires_at']
-                for col in new_columns:
-                    if col not in columns:
-                        try:
-                            with db.engine.connect() as conn:
-                                if col == 'max_uses':
-                                    conn.execute(db.text("ALTER TABLE redemption_code ADD COLUMN max_uses INT DEFAULT 1"))
-                                elif col == 'used_count':
-                                    conn.execute(db.text("ALTER TABLE redemption_code ADD COLUMN used_count INT DEFAULT 0"))
-                                elif col == 'expires_at':
-                                    conn.execute(db.text("ALTER TABLE redemption_code ADD COLUMN expires_at DATETIME"))
-                                conn.execute(db.text("COMMIT"))
-                        except Exception as e:
-                            print(f"添加{col}列时出错: {e}")
-            
-            if 'site_settings' in existing_tables:
-                columns = [col['name'] for col in inspector.get_columns('site_settings')]
-                if 'purchase_code_url' not in columns:
-                    try:
-                        with db.engine.connect() as conn:
-                            conn.execute(db.text("ALTER TABLE site_settings ADD COLUMN purchase_code_url VARCHAR(500) DEFAULT ''"))
-                            conn.execute(db.text("COMMIT"))
-                    except Exception as e:
-                        print(f"添加purchase_code_url列时出错: {e}")
-            
-            if 'site_settings' in existing_tables:
-                columns = [col['name'] for col in inspector.get_columns('site_settings')]
-                if 'tg_group_url' not in columns:
-                    try:
-                        with db.engine.connect() as conn:
-                            conn.execute(db.text("ALTER TABLE site_settings ADD COLUMN tg_group_url VARCHAR(500) DEFAULT ''"))
-                            conn.execute(db.text("COMMIT"))
-                    except Exception as e:
-                        print(f"添加tg_group_url列时出错: {e}")
-            
-            db.create_all()
-            
-            if 'user' in existing_tables:
-                try:
-                    with db.engine.connect() as conn:
-                        result = conn.execute(db.text("SELECT id, uid FROM user WHERE uid IS NULL OR uid = ''"))
-                        users_without_uid = result.fetchall()
-                        for user in users_without_uid:
-                            new_uid = generate_uid()
-                            conn.execute(db.text("UPDATE user SET uid = :uid WHERE id = :id"), {'uid': new_uid, 'id': user[0]})
-                        conn.execute(db.text("COMMIT"))
-                except Exception as e:
-                    print(f"为现有用户分配uid时出错: {e}")
-        
-        except Exception as e:
-            print(f"数据库迁移出错: {e}")
-        
-        try:
-            admin_username = os.getenv('ADMIN_USERNAME', 'admin')
-            admin_email = os.getenv('ADMIN_EMAIL', 'admin@example.com')
-            admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
-
-            if not User.query.filter_by(role='owner').first():
-                admin = User(username=admin_username, email=admin_email, is_admin=True, is_verified=True, uid=generate_uid(), role='owner')
-                admin.set_password(admin_password)
-                db.session.add(admin)
-                db.session.commit()
-
-            admin_username = os.getenv('ADMIN_USERNAME', 'admin')
-            for user in User.query.all():
-                if not user.uid:
-                    user.uid = generate_uid()
-                if user.username == admin_username and user.role != 'owner':
-                    user.role = 'owner'
-                    user.is_admin = True
-            db.session.commit()
-
-            if not SiteSettings.query.first():
-                settings = SiteSettings()
-                db.session.add(settings)
-                db.session.commit()
-
-            if not AboutPage.query.first():
-                about = AboutPage()
-                db.session.add(about)
-                db.session.commit()
-            
-            default_prefixes = [
-                'system', 'admin', 'administrator', 'root', 'host',
-                'report', 'abuse', 'support', 'help', 'info',
-                'contact', 'postmaster', 'webmaster', 'mailer-daemon',
-                'noreply', 'no-reply', 'service', 'services',
-                'security', 'privacy', 'legal', 'compliance',
-                'billing', 'payment', 'sales', 'marketing',
-                'press', 'media', 'pr', 'feedback',
-                'careers', 'jobs', 'hr', 'recruitment',
-                'dev', 'developer', 'api', 'api-admin',
-                'test', 'demo', 'example', 'sample',
-                'temp', 'tmp', 'guest', 'anonymous',
-                'user', 'users', 'member', 'members',
-                'customer', 'customers', 'client', 'clients',
-                'partner', 'partners', 'vendor', 'vendors',
-                'supplier', 'suppliers', 'manager', 'management',
-                'ceo', 'cfo', 'cto', 'director',
-                'executive', 'lead', 'head', 'owner',
-                'founder', 'co-founder', 'chairman', 'board',
-                'trustee', 'moderator', 'mod', 'supermod',
-                'superuser', 'su', 'sudo', 'wheel',
-                'staff', 'team', 'crew', 'office',
-                'office@', 'mail', 'mailbox', 'inbox',
-                'outbox', 'spam', 'trash', 'archive',
-                'draft', 'drafts', 'sent', 'sentmail'
-            ]
-            
-            for prefix in default_prefixes:
-                existing = PrefixBlacklist.query.filter_by(prefix=prefix).first()
-                if not existing:
-                    blacklist_item = PrefixBlacklist(prefix=prefix)
-                    db.session.add(blacklist_item)
-            
-            default_suffixes = [
-                '@gmail.com', '@hotmail.com', '@yahoo.com', '@qq.com',
-                '@163.com', '@126.com', '@88.com', '@vip.qq.com',
-                '@outlook.com', '@icloud.com', '@sina.com', '@sohu.com',
-                '@aliyun.com', '@foxmail.com', '@yeah.com', '@me.com', '@mail.com'
-            ]
-            
-            for suffix in default_suffixes:
-                existing = AllowedEmailSuffix.query.filter_by(suffix=suffix).first()
-                if not existing:
-                    suffix_item = AllowedEmailSuffix(suffix=suffix)
-                    db.session.add(suffix_item)
-            
-            db.session.commit()
-        except Exception as e:
-            print(f"初始化数据时出错: {e}")
+_configured = False
+
+
+def configure_app(config=None):
+    """配置并返回模块级的 app：绑定数据库、邮件和登录扩展，启用模板字节码缓存。
+
+    路由都注册在模块级的 app 上，这里不会创建新的应用实例。只做配置，不连接数据库、不建表；
+    建表和初始化数据请运行 init_db.py / update_db.py。重复调用返回同一个应用，
+    但传入与已生效配置不同的 config 会抛出 RuntimeError，而不是悄悄忽略。
+    """
+    global _configured
+    if _configured:
+        changed = sorted(key for key, value in (config or {}).items() if app.config.get(key) != value)
+        if changed:
+            raise RuntimeError(f'应用已经配置过，不能再修改配置项：{", ".join(changed)}')
+        return app
+    _configured = True
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(24))
+    # 邮件配置
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+    if config:
+        app.config.update(config)
+    if TRUSTED_PROXY_COUNT:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT,
+                                x_host=TRUSTED_PROXY_COUNT)
+    if JINJA_CACHE_DIR.lower() != 'none':
+        cache_dir = JINJA_CACHE_DIR or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    configure_database(app)
+    mail.init_app(app)
+    login_manager.init_app(app)
+    return app
+
+
+def warm_up():
+    """在 gunicorn master 进程中预先导入外部集成、编译全部模板并读取静态资源清单，fork 出的 worker 直接共享。
+
+    静态资源是部署的必需步骤：清单中缺少构建产物且未设置 ASSET_CDN_FALLBACK=true 时抛出 RuntimeError，gunicorn 不会启动。
+    """
+    import requests  # noqa: F401
+    import bs4  # noqa: F401
+    for name in app.jinja_env.list_templates():
+        if name.endswith('.html'):
+            app.jinja_env.get_template(name)
+    missing = [name for name in ('app.css', 'app.js') if name not in asset_manifest()]
+    if missing and not ASSET_CDN_FALLBACK:
+        raise RuntimeError(f'缺少静态资源构建产物 {", ".join(missing)}，请先运行 python build_assets.py --fetch 和 '
+                           f'python build_assets.py；确需从 CDN 加载时设置 ASSET_CDN_FALLBACK=true')
 
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
+    configure_app().run(debug=True)
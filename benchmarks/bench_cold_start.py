@@ -0,0 +1,95 @@
+"""冷启动基准测试。
+
+在全新的 Python 进程中分别测量：导入并配置应用、（可选）预热、首个请求的响应时间，
+以及首个响应后 requests / bs4 是否已被导入。每种模式重复多次，取中位数。
+
+模式：
+    eager    先导入 requests 和 bs4 再导入应用（模拟原先在模块顶部导入的做法）
+    lazy     只导入并配置应用，外部集成在首次使用时才导入
+    preload  导入应用后执行 warm_up()，相当于 gunicorn preload 时 master 进程的工作，
+             「首个响应」即 fork 出的 worker 处理第一个请求的耗时
+
+默认在临时 SQLite 数据库中运行（会先执行 init_db.py 建表），--database env 则使用 .env 中配置的数据库。
+
+用法：
+    python benchmarks/bench_cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+mode = sys.argv[1]
+start = time.perf_counter()
+if mode == 'eager':
+    import requests, bs4
+from app import configure_app, warm_up
+app = configure_app()
+imported = time.perf_counter()
+if mode == 'preload':
+    warm_up()
+warmed = time.perf_counter()
+client = app.test_client()
+status = [client.get(path).status_code for path in ('/', '/login')]
+done = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'warm': warmed - imported,
+    'first': done - warmed,
+    'status': status,
+    'requests': 'requests' in sys.modules,
+    'bs4': 'bs4' in sys.modules,
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动基准测试')
+    parser.add_argument('--database', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', default='eager,lazy,preload')
+    args = parser.parse_args()
+
+    # 未构建静态资源的检出也能运行 preload 模式
+    env = dict(os.environ, OUTBOX_SENDER='none', ASSET_CDN_FALLBACK='true')
+    if args.database == 'sqlite':
+        env['DB_TYPE'] = 'sqlite'
+        env['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        subprocess.run([sys.executable, 'init_db.py'], cwd=ROOT, env=env, check=True, capture_output=True)
+
+    print(f'数据库: {args.database}  每种模式运行: {args.runs} 次（取中位数，单位 ms）')
+    print(f'{"模式":<8}{"进程总耗时":>10}{"导入+配置":>10}{"预热":>8}{"首个响应":>10}  已导入 requests/bs4')
+    failed = False
+    for mode in args.modes.split(','):
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', PROBE, mode], cwd=ROOT, env=env,
+                                 check=True, capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            result['total'] = time.perf_counter() - start
+            samples.append(result)
+            failed = failed or any(code != 200 for code in result['status'])
+
+        def median(key):
+            return statistics.median(s[key] for s in samples) * 1000
+
+        loaded = f'{samples[-1]["requests"]}/{samples[-1]["bs4"]}'
+        print(f'{mode:<8}{median("total"):>13.1f}{median("import"):>13.1f}{median("warm"):>10.1f}'
+              f'{median("first"):>13.1f}  {loaded}')
+
+    if failed:
+        print('✗ 首个请求没有返回 200')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""用户中心渲染基准测试。
+
+为拥有不同数量邮箱的用户请求 /dashboard，对比每次重新查询渲染与使用缓存片段的耗时，
+并在缓存命中后修改一个邮箱，确认页面随数据版本号更新。
+另外对比全部模板在新进程中首次加载时，有无字节码缓存的编译耗时。
+
+默认在临时 SQLite 数据库中运行，--database env 则使用 .env 中配置的数据库
+（会创建并在结束后删除测试用户、域名和邮箱）。
+
+用法：
+    python benchmarks/bench_dashboard.py --emails 10,1000,5000 --requests 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def time_requests(client, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get('/dashboard')
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(timings) * 1000
+
+
+def time_template_load(app, bytecode_cache):
+    from jinja2 import Environment
+    env = Environment(loader=app.jinja_env.loader, bytecode_cache=bytecode_cache)
+    start = time.perf_counter()
+    for name in env.list_templates():
+        if name.endswith('.html'):
+            env.get_template(name)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户中心渲染基准测试')
+    parser.add_argument('--database', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--emails', default='10,1000,5000', help='每个测试用户的邮箱数量，逗号分隔')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.database == 'sqlite':
+        os.environ['DB_TYPE'] = 'sqlite'
+        os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['JINJA_CACHE_DIR'] = 'none'
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from jinja2 import FileSystemBytecodeCache
+    from app import configure_app, db, User, Domain, RegisteredEmail, fragment_cache, bump_data_version
+    app = configure_app()
+
+    tag = f'bench{int(time.time())}'
+    sizes = [int(n) for n in args.emails.split(',')]
+    with app.app_context():
+        db.create_all()
+        domain = Domain(domain=f'@{tag}.example.com')
+        users = [User(username=f'{tag}_{n}', email=f'{tag}_{n}@example.com', password_hash='-',
+                      is_verified=True, role='owner') for n in sizes]
+        db.session.add(domain)
+        db.session.add_all(users)
+        db.session.commit()
+        for user, n in zip(users, sizes):
+            db.session.execute(RegisteredEmail.__table__.insert(), [
+                {'user_id': user.id, 'domain_id': domain.id, 'prefix': f'u{user.id}m{i}',
+                 'email_address': f'u{user.id}m{i}{domain.domain}', 'email_password': 'Bench1234',
+                 'is_disabled': False}
+                for i in range(n)
+            ])
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        domain_id = domain.id
+
+    print(f'数据库: {args.database}  每组请求数: {args.requests}')
+    failed = False
+    max_bytes = fragment_cache.max_bytes
+    for user_id, n in zip(user_ids, sizes):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+
+        fragment_cache.max_bytes = 0
+        uncached = time_requests(client, args.requests)
+        fragment_cache.max_bytes = max_bytes
+        client.get('/dashboard')
+        cached = time_requests(client, args.requests)
+
+        # 修改一个邮箱的密码并递增版本号，缓存的页面应随之更新
+        with app.app_context():
+            RegisteredEmail.query.filter_by(user_id=user_id).limit(1).first().email_password = 'Changed5678'
+            bump_data_version(user_id)
+            db.session.commit()
+        fresh = 'Changed5678' in client.get('/dashboard').get_data(as_text=True)
+
+        print(f'邮箱 {n:>6}  逐次渲染 P50: {uncached:8.2f} ms  缓存片段 P50: {cached:8.2f} ms  '
+              f'加速: {uncached / cached:6.1f}x  {"✓" if fresh else "✗"} 修改后页面已更新')
+        failed = failed or not fresh
+
+    print(f'缓存片段 命中: {fragment_cache.hits}  未命中: {fragment_cache.misses}  '
+          f'占用: {fragment_cache.size / 1024:.1f} KB')
+
+    cache_dir = tempfile.mkdtemp()
+    no_cache = time_template_load(app, None)
+    time_template_load(app, FileSystemBytecodeCache(cache_dir))
+    with_cache = time_template_load(app, FileSystemBytecodeCache(cache_dir))
+    print(f'模板首次加载  无字节码缓存: {no_cache:.1f} ms  有字节码缓存: {with_cache:.1f} ms')
+
+    with app.app_context():
+        if args.database == 'env':
+            RegisteredEmail.query.filter(RegisteredEmail.user_id.in_(user_ids)).delete(synchronize_session=False)
+            User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+            Domain.query.filter_by(id=domain_id).delete()
+            db.session.commit()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""数据导入往返基准测试。
+
+依次导入域名、用户和邮箱（与后台 /admin/import 和 flask import 使用同一套 import_records），
+统计吞吐量，并校验：导入的域名与后台添加的一样以 @ 开头，邮箱全部挂到对应域名下，
+地址等于 前缀 + 域名，导出的邮箱数据与导入内容一致，按搜索条件导出的用户不受列表页
+USER_SEARCH_LIMIT 的限制，再次导入时全部按已存在拒绝。
+
+默认在临时 SQLite 数据库中运行，--database env 则使用 .env 中配置的数据库
+（会创建并在结束后删除测试用户、域名和邮箱）。
+
+用法：
+    python benchmarks/bench_import.py --domains 20 --users 2000 --emails 20000
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+
+def to_csv(fields, rows):
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(rows)
+    return text.getvalue().encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据导入往返基准测试')
+    parser.add_argument('--database', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--domains', type=int, default=20)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--emails', type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.database == 'sqlite':
+        os.environ['DB_TYPE'] = 'sqlite'
+        os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.datastructures import MultiDict
+    from app import (configure_app, db, User, Domain, RegisteredEmail, iter_import_file, import_records,
+                     iter_export)
+    app = configure_app()
+
+    tag = f'bench{int(time.time())}'
+    # 一半域名按后台的写法带 @，一半省略 @，导入后都应以 @ 开头
+    domain_names = [f'{tag}-{i}.example.com' for i in range(args.domains)]
+    files = {
+        'domains': to_csv(['domain'], [
+            {'domain': f'@{name}' if i % 2 else name} for i, name in enumerate(domain_names)
+        ]),
+        'users': to_csv(['username', 'email', 'password_hash'], [
+            {'username': f'{tag}_{i}', 'email': f'{tag}_{i}@example.org', 'password_hash': '-'}
+            for i in range(args.users)
+        ]),
+        'emails': to_csv(['email_address', 'email_password', 'owner_username'], [
+            {'email_address': f'm{i}@{domain_names[i % args.domains]}', 'email_password': 'Bench1234',
+             'owner_username': f'{tag}_{i % args.users}'}
+            for i in range(args.emails)
+        ]),
+    }
+
+    errors = []
+    results = {}
+    with app.app_context():
+        db.create_all()
+        for kind, data in files.items():
+            start = time.perf_counter()
+            stats = import_records(kind, iter_import_file(io.BytesIO(data), 'csv'), lambda line, reason: errors.append((kind, line, reason)))
+            elapsed = time.perf_counter() - start
+            results[kind] = stats
+            print(f'{kind:<8} 导入: {stats["inserted"]:>7}  拒绝: {stats["rejected"]:>5}  '
+                  f'耗时: {elapsed:.3f}s  吞吐量: {stats["inserted"] / elapsed:.0f} 行/秒')
+
+        domains = Domain.query.filter(Domain.domain.in_([f'@{name}' for name in domain_names])).all()
+        domain_ids = [d.id for d in domains]
+        emails = (db.session.query(RegisteredEmail.email_address, RegisteredEmail.prefix, Domain.domain)
+                  .join(Domain, RegisteredEmail.domain_id == Domain.id)
+                  .filter(Domain.id.in_(domain_ids)).all())
+
+        exported = []
+        for domain_id in domain_ids:
+            body = b''.join(iter_export('emails', MultiDict({'domain_id': str(domain_id)}), 'csv', False))
+            exported.extend(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+        body = b''.join(iter_export('users', MultiDict({'search': tag}), 'csv', False))
+        exported_users = list(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+
+        again = import_records('emails', iter_import_file(io.BytesIO(files['emails']), 'csv'), lambda line, reason: None)
+
+        user_ids = [u.id for u in User.query.filter(User.username.startswith(f'{tag}_'))]
+        if args.database == 'env':
+            RegisteredEmail.query.filter(RegisteredEmail.domain_id.in_(domain_ids)).delete(synchronize_session=False)
+            User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+            Domain.query.filter(Domain.id.in_(domain_ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+    for kind, line, reason in errors[:10]:
+        print(f'  {kind} 第 {line} 行: {reason}')
+
+    checks = [
+        ('全部域名导入成功且以 @ 开头', results['domains']['inserted'] == args.domains and len(domains) == args.domains),
+        ('全部邮箱导入成功', results['emails']['inserted'] == args.emails and len(emails) == args.emails),
+        ('邮箱地址等于 前缀 + 域名', all(address == f'{prefix}{domain}' for address, prefix, domain in emails)),
+        ('导出的邮箱与导入一致', sorted(row['email_address'] for row in exported) == sorted(e[0] for e in emails)),
+        ('按搜索条件导出全部匹配的用户', len(exported_users) == args.users),
+        ('再次导入时全部按已存在拒绝', again == {'inserted': 0, 'rejected': args.emails}),
+        ('没有出现错误', not errors),
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f'{"✓" if ok else "✗"} {name}')
+        failed = failed or not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""邮箱配额并发基准测试。
+
+并发创建和转移邮箱记录，统计吞吐量并校验任何用户的邮箱数都没有超过配额。
+只测试数据库中的配额控制，不调用 Serv00 面板。
+默认在临时 SQLite 数据库中运行，--database env 则使用 .env 中配置的数据库
+（会创建并在结束后删除测试用户、域名和邮箱）。
+
+用法：
+    python benchmarks/bench_quota.py --threads 32 --creates 3000 --transfers 2000 --users 50 --quota 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='邮箱配额并发基准测试')
+    parser.add_argument('--database', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--creates', type=int, default=3000)
+    parser.add_argument('--transfers', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--quota', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.database == 'sqlite':
+        os.environ['DB_TYPE'] = 'sqlite'
+        os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('DB_POOL_SIZE', str(args.threads))
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import configure_app, db, User, Domain, RegisteredEmail, claim_email_slot, transfer_email_to
+    app = configure_app()
+
+    tag = f'bench{int(time.time())}'
+    with app.app_context():
+        db.create_all()
+        domain = Domain(domain=f'@{tag}.example.com')
+        users = [User(username=f'{tag}_{i}', email=f'{tag}_{i}@example.com', password_hash='-',
+                      is_verified=True, max_emails=args.quota, extra_emails=0)
+                 for i in range(args.users)]
+        db.session.add(domain)
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        domain_id, domain_name = domain.id, domain.domain
+
+    rng = random.Random(args.seed)
+    operations = ['create'] * args.creates + ['transfer'] * args.transfers
+    rng.shuffle(operations)
+    plans = [(op, rng.choice(user_ids), rng.choice(user_ids)) for op in operations]
+
+    def run(i):
+        op, user_id, other_id = plans[i]
+        with app.app_context():
+            try:
+                if op == 'create':
+                    prefix = f'b{i}'
+                    return op, claim_email_slot(
+                        user_id,
+                        email_address=f'{prefix}{domain_name}',
+                        email_password='-',
+                        prefix=prefix,
+                        domain_id=domain_id
+                    )[0]
+                email_id = db.session.execute(
+                    db.select(RegisteredEmail.id).where(RegisteredEmail.user_id == user_id).limit(1)
+                ).scalar()
+                if email_id is None or user_id == other_id:
+                    return op, 'skipped'
+                return op, transfer_email_to(email_id, user_id, other_id)
+            except Exception as e:
+                db.session.rollback()
+                return op, f'error: {type(e).__name__}'
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = Counter(executor.map(run, range(len(plans))))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        counts = dict(db.session.execute(
+            db.select(RegisteredEmail.user_id, db.func.count())
+            .where(RegisteredEmail.user_id.in_(user_ids))
+            .group_by(RegisteredEmail.user_id)
+        ).all())
+        total = sum(counts.values())
+
+        if args.database == 'env':
+            RegisteredEmail.query.filter(RegisteredEmail.user_id.in_(user_ids)).delete(synchronize_session=False)
+            User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+            Domain.query.filter_by(id=domain_id).delete()
+            db.session.commit()
+
+    created = results.get(('create', 'ok'), 0)
+    errors = sum(n for (_, status), n in results.items() if status.startswith('error'))
+
+    print(f'数据库: {args.database}  线程: {args.threads}  创建: {args.creates}  转移: {args.transfers}  '
+          f'用户: {args.users}  配额: {args.quota}')
+    print(f'耗时: {elapsed:.3f}s  吞吐量: {len(plans) / elapsed:.1f} 次/秒')
+    print(f'结果: {dict(sorted(results.items()))}')
+    print(f'邮箱总数={total}  单用户最大邮箱数={max(counts.values(), default=0)}')
+
+    checks = [
+        ('没有用户超过配额', all(n <= args.quota for n in counts.values())),
+        ('邮箱总数等于创建成功次数', total == created),
+        ('创建成功次数未超过总配额', created <= args.users * args.quota),
+        ('没有出现错误', errors == 0),
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f'{"✓" if ok else "✗"} {name}')
+        failed = failed or not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""卡密并发兑换基准测试。
+
+并发提交大量兑换请求，统计吞吐量并校验使用次数与配额是否严格一致。
+默认在临时 SQLite 数据库中运行，--database env 则使用 .env 中配置的数据库
+（会创建并在结束后删除测试用户和卡密）。
+
+用法：
+    python benchmarks/bench_redeem.py --threads 32 --attempts 5000 --max-uses 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='卡密并发兑换基准测试')
+    parser.add_argument('--database', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=5000)
+    parser.add_argument('--max-uses', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--extra-emails', type=int, default=1)
+    parser.add_argument('--duration-days', type=int, default=0, help='0 表示永久卡密')
+    args = parser.parse_args()
+
+    if args.database == 'sqlite':
+        os.environ['DB_TYPE'] = 'sqlite'
+        os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('DB_POOL_SIZE', str(args.threads))
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import configure_app, db, User, RedemptionCode, redeem_code_for_user
+    app = configure_app()
+
+    tag = f'bench{int(time.time())}'
+    with app.app_context():
+        db.create_all()
+        users = [User(username=f'{tag}_{i}', email=f'{tag}_{i}@example.com', password_hash='-', is_verified=True)
+                 for i in range(args.users)]
+        db.session.add_all(users)
+        code = RedemptionCode(
+            code=RedemptionCode.generate_code(),
+            extra_emails=args.extra_emails,
+            is_permanent=args.duration_days == 0,
+            duration_days=args.duration_days or None,
+            max_uses=args.max_uses
+        )
+        db.session.add(code)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        code_id, code_str = code.id, code.code
+
+    def redeem(i):
+        with app.app_context():
+            try:
+                return redeem_code_for_user(code_str, user_ids[i % len(user_ids)])[0]
+            except Exception as e:
+                db.session.rollback()
+                return f'error: {type(e).__name__}'
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = Counter(executor.map(redeem, range(args.attempts)))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        code = db.session.get(RedemptionCode, code_id)
+        users = User.query.filter(User.id.in_(user_ids)).all()
+        if args.duration_days:
+            granted = sum(u.temp_extra_emails or 0 for u in users)
+        else:
+            granted = sum(u.extra_emails or 0 for u in users)
+        used_count, is_used = code.used_count, code.is_used
+
+        if args.database == 'env':
+            RedemptionCode.query.filter_by(id=code_id).delete()
+            for user in users:
+                db.session.delete(user)
+            db.session.commit()
+
+    successes = results.get('ok', 0)
+    errors = sum(n for k, n in results.items() if k.startswith('error'))
+    expected = min(args.max_uses, args.attempts) if args.max_uses > 0 else args.attempts
+
+    print(f'数据库: {args.database}  线程: {args.threads}  请求: {args.attempts}  最大使用次数: {args.max_uses}')
+    print(f'耗时: {elapsed:.3f}s  吞吐量: {args.attempts / elapsed:.1f} 次/秒')
+    print(f'结果: {dict(results)}')
+    print(f'used_count={used_count}  is_used={is_used}  发放配额={granted}')
+
+    checks = [
+        ('成功次数等于 used_count', successes == used_count),
+        ('used_count 未超过 max_uses', args.max_uses <= 0 or used_count <= args.max_uses),
+        ('发放配额等于成功次数 × 每次配额', granted == successes * args.extra_emails),
+        ('达到上限时标记为已使用', is_used == (args.max_uses > 0 and used_count >= args.max_uses)),
+    ]
+    if not errors:
+        checks.append(('无错误时恰好用满可用次数', successes == expected))
+    failed = False
+    for name, ok in checks:
+        print(f'{"✓" if ok else "✗"} {name}')
+        failed = failed or not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
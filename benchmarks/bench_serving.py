@@ -0,0 +1,169 @@
+"""gunicorn 线程模式与协程模式对比基准测试。
+
+启动一个本地 reCAPTCHA 替身服务（每次校验固定延迟后返回），分别用 gthread 和 gevent
+worker 启动单个 gunicorn 进程，并发提交登录表单。登录请求会等待替身服务的校验结果，
+用来模拟面板抓取、OAuth、SMTP 这类以网络等待为主的路由。统计吞吐量和延迟。
+
+默认在临时 SQLite 数据库中运行（会先执行 init_db.py 建表），--database env 则使用 .env 中配置的数据库。
+gevent 模式需要 pip install gevent。
+
+用法：
+    python benchmarks/bench_serving.py --concurrency 500 --requests 3000 --delay 0.2 --threads 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def handle_stand_in(reader, writer, delay):
+    # 极简 HTTP/1.1 服务：读取请求，等待 delay 秒后返回校验结果，支持 keep-alive
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            if length:
+                await reader.readexactly(length)
+            await asyncio.sleep(delay)
+            body = json.dumps({'success': False}).encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def start_stand_in(port, delay):
+    loop = asyncio.new_event_loop()
+
+    async def serve():
+        server = await asyncio.start_server(lambda r, w: handle_stand_in(r, w, delay), '127.0.0.1', port, backlog=4096)
+        await server.serve_forever()
+
+    threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True).start()
+
+
+async def post_login(port, semaphore, latencies, statuses):
+    body = b'username=bench-nobody&password=x&g-recaptcha-response=token'
+    request = (b'POST /login HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+               b'Content-Type: application/x-www-form-urlencoded\r\n'
+               b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            writer.close()
+            status = int(status_line.split()[1])
+        except (OSError, IndexError, ValueError):
+            status = 'error'
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def run_load(port, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(post_login(port, semaphore, latencies, statuses) for _ in range(total)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def wait_ready(port, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('gunicorn 启动失败')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn 启动超时')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn 线程模式与协程模式对比基准测试')
+    parser.add_argument('--database', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--modes', default='gthread,gevent')
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--delay', type=float, default=0.2, help='替身服务每次校验的延迟（秒）')
+    parser.add_argument('--threads', type=int, default=32, help='gthread 模式的线程数')
+    parser.add_argument('--worker-connections', type=int, default=2000, help='gevent 模式的最大连接数')
+    args = parser.parse_args()
+
+    stand_in_port = free_port()
+    start_stand_in(stand_in_port, args.delay)
+
+    env = dict(os.environ,
+               OUTBOX_SENDER='none',
+               RATE_LIMIT_BACKEND='none',
+               RECAPTCHA_ENABLED='true',
+               RECAPTCHA_SITE_KEY='bench',
+               RECAPTCHA_SECRET_KEY='bench',
+               RECAPTCHA_VERIFY_URL=f'http://127.0.0.1:{stand_in_port}/siteverify',
+               RECAPTCHA_TIMEOUT='30',
+               RECAPTCHA_POOL_SIZE=str(args.concurrency),
+               WEB_CONCURRENCY='1',
+               GUNICORN_THREADS=str(args.threads),
+               GUNICORN_WORKER_CONNECTIONS=str(args.worker_connections),
+               GUNICORN_TIMEOUT='120')
+    if args.database == 'sqlite':
+        env['DB_TYPE'] = 'sqlite'
+        env['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        subprocess.run([sys.executable, 'init_db.py'], cwd=ROOT, env=env, check=True, capture_output=True)
+
+    print(f'数据库: {args.database}  并发: {args.concurrency}  请求数: {args.requests}  '
+          f'替身延迟: {args.delay * 1000:.0f} ms  gthread 线程数: {args.threads}')
+    failed = False
+    for mode in args.modes.split(','):
+        port = free_port()
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', os.devnull,
+             '-b', f'127.0.0.1:{port}', 'wsgi:app'],
+            cwd=ROOT, env=dict(env, GUNICORN_WORKER_CLASS=mode),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(port, proc)
+            asyncio.run(run_load(port, min(args.requests, 50), 10))
+            elapsed, latencies, statuses = asyncio.run(run_load(port, args.requests, args.concurrency))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+        latencies.sort()
+        ok = statuses.get(302, 0)
+        print(f'{mode:<8} 吞吐量: {args.requests / elapsed:8.1f} 次/秒  '
+              f'P50: {statistics.median(latencies) * 1000:8.1f} ms  '
+              f'P99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:8.1f} ms  结果: {dict(sorted(statuses.items(), key=str))}')
+        failed = failed or ok != args.requests
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
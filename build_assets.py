@@ -0,0 +1,241 @@
+"""静态资源构建。
+
+把 Bootstrap、Font Awesome、Animate.css、AOS、Poppins 字体和站点自身的 CSS/JS 合并压缩为
+带内容哈希的文件（static/dist/app.<hash>.css 等），CSS 引用的字体同样加上哈希，
+并生成 gzip / brotli 预压缩版本和 manifest.json。页面通过 manifest 引用这些文件，
+文件名随内容变化，因此可以长期缓存。
+
+    python build_assets.py --fetch   # 从上游下载固定版本的第三方资源到 static/vendor/（下载后提交到仓库）
+    python build_assets.py           # 构建到 static/dist/
+
+brotli 与 rjsmin 为可选依赖：未安装 brotli 时不生成 .br 文件，未安装 rjsmin 时站点 JS 只合并不压缩。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import urllib.parse
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(ROOT, 'static')
+VENDOR = os.path.join(STATIC, 'vendor')
+DIST = os.path.join(STATIC, 'dist')
+MANIFEST = os.path.join(DIST, 'manifest.json')
+
+# 第三方资源：static/vendor/ 下的路径 -> 固定版本的上游地址
+VENDOR_FILES = {
+    'bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'fontawesome/css/all.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    'animate/animate.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/animate.css/4.1.1/animate.min.css',
+    'aos/aos.css': 'https://cdnjs.cloudflare.com/ajax/libs/aos/2.3.4/aos.css',
+    'aos/aos.js': 'https://cdnjs.cloudflare.com/ajax/libs/aos/2.3.4/aos.js',
+    'poppins/poppins.css': 'https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap',
+}
+
+# 合并顺序与页面原先的引用顺序一致，路径相对 static/
+BUNDLES = {
+    'app.css': [
+        'vendor/bootstrap/bootstrap.min.css',
+        'vendor/fontawesome/css/all.min.css',
+        'vendor/animate/animate.min.css',
+        'vendor/aos/aos.css',
+        'vendor/poppins/poppins.css',
+        'css/base.css',
+    ],
+    'app.js': [
+        'vendor/bootstrap/bootstrap.bundle.min.js',
+        'vendor/aos/aos.js',
+        'js/liquid-glass-effects.js',
+    ],
+}
+
+# 生成预压缩版本的文件类型（woff2、图片等本身已压缩）
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.eot', '.otf')
+
+# Google Fonts 按 User-Agent 返回字体格式，使用现代浏览器的 UA 以获得 woff2
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+SOURCE_MAP = re.compile(r'^\s*(//|/\*)# sourceMappingURL=.*$', re.M)
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def download(url):
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def localize_css(css, css_url, css_path, fetched):
+    """下载 CSS 中引用的字体等文件到 vendor 目录，引用改为相对路径。"""
+    base_dir = os.path.dirname(css_path)
+
+    def replace(match):
+        ref = match.group(2).strip()
+        if ref.startswith(('data:', '#')):
+            return match.group(0)
+        absolute = urllib.parse.urljoin(css_url, ref)
+        if urllib.parse.urlparse(ref).scheme:
+            # 绝对地址（如 Google Fonts 的字体）保存到 CSS 所在目录
+            local = os.path.basename(urllib.parse.urlparse(absolute).path)
+        else:
+            local = ref.split('?')[0].split('#')[0]
+        target = os.path.normpath(os.path.join(base_dir, local))
+        if target not in fetched:
+            write(os.path.join(VENDOR, target), download(absolute))
+            fetched.add(target)
+            print(f'  ✓ {target}')
+        return f'url({local})'
+
+    return CSS_URL.sub(replace, css)
+
+
+def fetch_vendor():
+    fetched = set()
+    for path, url in VENDOR_FILES.items():
+        data = download(url)
+        if path.endswith('.css'):
+            data = localize_css(data.decode('utf-8'), url, path, fetched).encode('utf-8')
+        write(os.path.join(VENDOR, path), data)
+        print(f'✓ {path}')
+
+
+def minify_css(css):
+    """去掉注释（保留 /*! 版权注释）和多余空白，字符串内容保持不变。"""
+    css = re.sub(r'/\*(?!!).*?\*/', '', css, flags=re.S)
+    parts = CSS_STRING.split(css)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i])
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        parts[i] = part.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+class Builder:
+    def __init__(self):
+        self.manifest = {}
+
+    def emit(self, logical, data):
+        """写入带内容哈希的文件及其预压缩版本，返回相对 static/ 的路径。"""
+        if logical in self.manifest:
+            return self.manifest[logical]
+        stem, ext = os.path.splitext(os.path.basename(logical))
+        filename = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        path = os.path.join(DIST, filename)
+        write(path, data)
+        if ext in COMPRESSIBLE:
+            variants = [('.gz', gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in variants:
+                if len(compressed) < len(data):
+                    write(path + suffix, compressed)
+        self.manifest[logical] = f'dist/{filename}'
+        return self.manifest[logical]
+
+    def rewrite_css_urls(self, css, source):
+        """CSS 引用的本地文件也输出到 dist/ 并加上哈希，引用改为新文件名。"""
+        base_dir = os.path.dirname(source)
+
+        def replace(match):
+            ref = match.group(2).strip()
+            if ref.startswith(('data:', '#')) or urllib.parse.urlparse(ref).scheme or ref.startswith('//'):
+                return match.group(0)
+            # 先分出 #片段（如 Font Awesome svg 字体的 #fontawesome），再去掉查询参数
+            path, _, fragment = ref.partition('#')
+            path = path.split('?')[0]
+            target = os.path.normpath(os.path.join(base_dir, path))
+            full = os.path.join(STATIC, target)
+            if not os.path.isfile(full):
+                print(f'  ! {source} 引用的 {ref} 不存在，保留原引用')
+                return match.group(0)
+            with open(full, 'rb') as f:
+                emitted = self.emit(target, f.read())
+            name = os.path.basename(emitted)
+            return f'url({name}#{fragment})' if fragment else f'url({name})'
+
+        return CSS_URL.sub(replace, css)
+
+    def bundle(self, name, sources):
+        parts = []
+        for source in sources:
+            with open(os.path.join(STATIC, source), encoding='utf-8') as f:
+                text = SOURCE_MAP.sub('', f.read())
+            if name.endswith('.css'):
+                text = self.rewrite_css_urls(text, source)
+                if not source.endswith('.min.css'):
+                    text = minify_css(text)
+            elif not source.endswith('.min.js') and rjsmin is not None:
+                text = rjsmin.jsmin(text)
+            parts.append(text.strip())
+        # JS 之间加分号，避免上一个文件末尾缺少分号
+        data = ('\n' if name.endswith('.css') else ';\n').join(parts).encode('utf-8')
+        return self.emit(name, data)
+
+
+def build():
+    missing = [s for sources in BUNDLES.values() for s in sources if not os.path.isfile(os.path.join(STATIC, s))]
+    if missing:
+        print('缺少以下文件，请先运行 python build_assets.py --fetch：')
+        for path in missing:
+            print(f'  {path}')
+        sys.exit(1)
+
+    try:
+        with open(MANIFEST, encoding='utf-8') as f:
+            previous = json.load(f)
+    except FileNotFoundError:
+        previous = {}
+
+    builder = Builder()
+    for name, sources in BUNDLES.items():
+        path = builder.bundle(name, sources)
+        size = os.path.getsize(os.path.join(STATIC, path))
+        print(f'✓ {name} -> {path} ({size / 1024:.1f} KB)')
+    write(MANIFEST, json.dumps(builder.manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    # 保留本次和上一次构建的文件，滚动发布期间旧页面仍能加载旧资源
+    keep = {os.path.basename(p) for p in list(builder.manifest.values()) + list(previous.values())}
+    keep |= {name + suffix for name in list(keep) for suffix in ('.gz', '.br')}
+    keep.add(os.path.basename(MANIFEST))
+    for filename in os.listdir(DIST):
+        if filename not in keep:
+            os.remove(os.path.join(DIST, filename))
+
+    print(f'✓ 已生成 {len(builder.manifest)} 个文件'
+          f'{"" if brotli else "（未安装 brotli，跳过 .br）"}{"" if rjsmin else "（未安装 rjsmin，站点 JS 未压缩）"}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='静态资源构建')
+    parser.add_argument('--fetch', action='store_true', help='从上游下载第三方资源到 static/vendor/')
+    args = parser.parse_args()
+    if args.fetch:
+        fetch_vendor()
+    else:
+        build()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""gunicorn 配置：gunicorn -c gunicorn.conf.py wsgi:app
+
+preload_app 让 master 进程导入并配置好应用、编译好模板后再 fork 出 worker，
+worker 共享这些内存页，启动更快也更省内存。
+
+GUNICORN_WORKER_CLASS=gevent 启用协程模式（需 pip install gevent），
+一个进程可同时挂起上千个等待面板、reCAPTCHA、OAuth 或 SMTP 的请求。
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+# gthread：每个请求占用一个系统线程；gevent：协程模式，等待网络时让出执行权
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+preload_app = True
+accesslog = '-'
+
+if worker_class == 'gevent':
+    # 必须在 preload 导入应用之前打补丁，socket / ssl / threading / time.sleep 才会换成协程版本：
+    # PyMySQL、requests、smtplib 的网络等待以及后台发件线程、人机验证线程池都不再占用系统线程
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def when_ready(server):
+    # 应用已在 master 中加载，fork worker 之前完成预热
+    from app import warm_up
+    warm_up()
+
+
+def post_fork(server, worker):
+    # worker 不复用从 master 继承的数据库连接，各自重新建立
+    from app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -1,8 +1,9 @@
-from app import app, db
+from models import create_db_app, db
 from datetime import datetime
 from sqlalchemy import text
 
 def init_database():
+    app = create_db_app()
     with app.app_context():
         print("正在创建所有数据表...")
         db.create_all()
@@ -19,7 +20,7 @@ def init_database():
                 except:
                     try:
                         conn.execute(text("ALTER TABLE user ADD COLUMN nodeloc_id BIGINT UNIQUE"))
-                        conn.execute(text("COMMIT"))
+                        conn.commit()
                         print("✓ 已添加 nodeloc_id 列")
                     except Exception as e:
                         print(f"  nodeloc_id 列添加跳过: {e}")
@@ -31,7 +32,7 @@ def init_database():
                 except:
                     try:
                         conn.execute(text("ALTER TABLE user ADD COLUMN telegram_id BIGINT UNIQUE"))
-                        conn.execute(text("COMMIT"))
+                        conn.commit()
                         print("✓ 已添加 telegram_id 列")
                     except Exception as e:
                         print(f"  telegram_id 列添加跳过: {e}")
@@ -43,7 +44,7 @@ def init_database():
                 except:
                     try:
                         conn.execute(text("ALTER TABLE user ADD COLUMN google_id VARCHAR(100) UNIQUE"))
-                        conn.execute(text("COMMIT"))
+                        conn.commit()
                         print("✓ 已添加 google_id 列")
                     except Exception as e:
                         print(f"  google_id 列添加跳过: {e}")
@@ -53,7 +54,7 @@ def init_database():
         
         print("\n正在初始化默认数据...")
         
-        from app import User, SiteSettings, UserAgreement, AboutPage, PrefixBlacklist, AllowedEmailSuffix
+        from models import User, SiteSettings, UserAgreement, AboutPage, PrefixBlacklist, AllowedEmailSuffix
         
         # 初始化站点设置
         if not SiteSettings.query.first():
@@ -145,7 +146,7 @@ def init_database():
         admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
         
         if not User.query.filter_by(role='owner').first():
-            from app import generate_uid
+            from models import generate_uid
             admin = User(
                 username=admin_username,
                 email=admin_email,
@@ -0,0 +1,621 @@
+"""数据库连接、连接池与数据模型。
+
+只依赖 Flask-SQLAlchemy，建表和迁移脚本可以单独导入本模块，不必加载整个 Web 应用。
+"""
+from flask import Flask, g, session, has_request_context
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as SQLAlchemySession
+from sqlalchemy import TextClause, UpdateBase
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from flask_login import UserMixin
+from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime
+from dotenv import load_dotenv
+import os
+import random
+import secrets
+import string
+import threading
+import time
+
+load_dotenv()
+
+# 用户搜索
+USER_SEARCH_LIMIT = 50
+USER_SEARCH_GRAM_SIZE = 3
+# 子串搜索从最少见的三元组出发，候选用户最多取这么多个
+USER_SEARCH_SCAN_LIMIT = 5000
+
+# 数据库配置，DB_TYPE 可选 mysql / sqlite
+DB_TYPE = os.getenv('DB_TYPE', 'mysql').lower()
+db_host = os.getenv('DB_HOST', 'localhost')
+db_port = os.getenv('DB_PORT', '3306')
+db_user = os.getenv('DB_USER', 'root')
+db_password = os.getenv('DB_PASSWORD', '')
+db_name = os.getenv('DB_NAME', 'email_registration')
+
+
+class PoolMetrics:
+    """连接池指标：获取连接的等待时间、超时、失效次数等，在后台「数据库连接池」页面展示。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.pools = {}
+
+    def _stat(self, name):
+        if name not in self.stats:
+            self.stats[name] = {
+                'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'slow_waits': 0,
+                'timeouts': 0, 'connects': 0, 'invalidations': 0, 'soft_invalidations': 0
+            }
+        return self.stats[name]
+
+    def record_wait(self, pool, seconds, timed_out=False):
+        name = getattr(pool, 'metrics_name', 'primary')
+        with self._lock:
+            stat = self._stat(name)
+            if timed_out:
+                stat['timeouts'] += 1
+                return
+            stat['checkouts'] += 1
+            stat['wait_total'] += seconds
+            stat['wait_max'] = max(stat['wait_max'], seconds)
+            if seconds >= 0.01:
+                stat['slow_waits'] += 1
+
+    def count(self, name, key):
+        with self._lock:
+            self._stat(name)[key] += 1
+
+    def attach(self, name, engine):
+        pool = engine.pool
+        pool.metrics_name = name
+        self.pools[name] = pool
+        db.event.listen(pool, 'connect', lambda *a: self.count(name, 'connects'))
+        db.event.listen(pool, 'invalidate', lambda *a: self.count(name, 'invalidations'))
+        db.event.listen(pool, 'soft_invalidate', lambda *a: self.count(name, 'soft_invalidations'))
+
+    def snapshot(self):
+        result = []
+        with self._lock:
+            for name, pool in self.pools.items():
+                stat = dict(self._stat(name))
+                stat['name'] = name
+                stat['status'] = pool.status()
+                for attr in ('size', 'checkedout', 'checkedin', 'overflow'):
+                    method = getattr(pool, attr, None)
+                    stat[attr] = method() if callable(method) else None
+                stat['max_overflow'] = getattr(pool, '_max_overflow', None)
+                stat['wait_avg'] = stat['wait_total'] / stat['checkouts'] if stat['checkouts'] else 0.0
+                result.append(stat)
+        return result
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(self, time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(self, time.perf_counter() - start)
+        return conn
+
+
+# SQLite 连接参数：WAL 日志允许读写并发，其余为适合小型部署的缓存设置
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', '268435456')),
+    'busy_timeout': int(float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')) * 1000)
+}
+
+# 只读副本配置（可选），格式: host1:3306,host2:3306，账号与主库相同
+DB_REPLICA_HOSTS = [h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()] if DB_TYPE == 'mysql' else []
+# 用户写入后在该时间内（秒）的读取仍走主库，保证读到自己的写入
+DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+REPLICA_BIND_KEYS = [f'replica_{i}' for i in range(len(DB_REPLICA_HOSTS))]
+
+
+class RoutingSession(SQLAlchemySession):
+    """只读路由的查询发往副本，写操作、写之后的读取以及刚写入过的用户的读取发往主库。"""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._wrote = False
+        self._replica_key = random.choice(REPLICA_BIND_KEYS) if REPLICA_BIND_KEYS else None
+
+    def _use_replica(self):
+        if self._replica_key is None or self._wrote or not has_request_context():
+            return False
+        if not g.get('read_replica'):
+            return False
+        return session.get('db_write_at', 0) + DB_REPLICA_STICKY_SECONDS < time.time()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, (UpdateBase, TextClause)):
+                self._wrote = True
+                if has_request_context():
+                    g.db_wrote = True
+            elif self._use_replica():
+                return self._db.engines[self._replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def configure_database(app):
+    """写入数据库连接、连接池和只读副本配置并绑定 db，已在 app.config 中给出的配置优先。"""
+    if DB_TYPE == 'sqlite':
+        sqlite_path = os.path.abspath(os.getenv('SQLITE_PATH', os.path.join(app.instance_path, 'email_registration.db')))
+        os.makedirs(os.path.dirname(sqlite_path), exist_ok=True)
+        app.config.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{sqlite_path}')
+    else:
+        app.config.setdefault('SQLALCHEMY_DATABASE_URI', f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+
+    # 数据库连接池配置，DB_POOL_RECYCLE 应小于 MySQL 的 wait_timeout
+    engine_options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10'))
+    }
+    if DB_TYPE == 'sqlite':
+        engine_options['connect_args'] = {
+            'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')),
+            'check_same_thread': False
+        }
+    else:
+        engine_options.update({
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '280')),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+            'connect_args': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+                'read_timeout': int(os.getenv('DB_READ_TIMEOUT', '30')),
+                'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', '30'))
+            }
+        })
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options)
+
+    for bind_key, replica_host in zip(REPLICA_BIND_KEYS, DB_REPLICA_HOSTS):
+        replica_host, _, replica_port = replica_host.partition(':')
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[bind_key] = \
+            f'mysql+pymysql://{db_user}:{db_password}@{replica_host}:{replica_port or db_port}/{db_name}'
+
+    db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            pool_metrics.attach(bind_key or 'primary', engine)
+            if engine.dialect.name == 'sqlite':
+                db.event.listen(engine, 'connect', apply_sqlite_pragmas)
+
+
+def create_db_app():
+    """只配置了数据库的最小应用，供 init_db.py、update_db.py 等脚本使用。"""
+    app = Flask(__name__)
+    configure_database(app)
+    return app
+
+
+def generate_uid():
+    return ''.join(secrets.choice(string.digits) for _ in range(8))
+
+
+# 数据库模型
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    uid = db.Column(db.String(20), unique=True, nullable=False, default=generate_uid)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
+    nodeloc_id = db.Column(db.BigInteger, unique=True)
+    telegram_id = db.Column(db.BigInteger, unique=True)
+    google_id = db.Column(db.String(100), unique=True)
+    is_verified = db.Column(db.Boolean, default=False)
+    is_banned = db.Column(db.Boolean, default=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    role = db.Column(db.String(20), default='user')
+    max_emails = db.Column(db.Integer, default=2)
+    extra_emails = db.Column(db.Integer, default=0)
+    temp_extra_emails = db.Column(db.Integer, default=0)
+    temp_expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 邮箱数据版本号，邮箱创建、重置、转移或被管理员修改时递增，用户中心的缓存片段以此为键
+    data_version = db.Column(db.Integer, default=0)
+    emails = db.relationship('RegisteredEmail', backref='owner', lazy=True)
+    verification_tokens = db.relationship('VerificationToken', backref='user', lazy=True)
+    tickets = db.relationship('Ticket', backref='user', lazy=True)
+    redeemed_codes = db.relationship('RedemptionCode', backref='user', lazy=True)
+
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def check_password(self, password):
+        return check_password_hash(self.password_hash, password)
+
+    def get_max_emails(self):
+        if self.role == 'owner':
+            return 999999
+        
+        total = self.max_emails + self.extra_emails
+        
+        if self.temp_expires_at and self.temp_expires_at > datetime.utcnow():
+            total += self.temp_extra_emails
+        
+        return total
+
+    def get_email_count(self):
+        return RegisteredEmail.query.filter_by(user_id=self.id).count()
+
+    def can_create_email(self):
+        return self.get_email_count() < self.get_max_emails()
+
+    def is_owner(self):
+        return self.role == 'owner'
+
+    def can_access_admin(self):
+        return self.role == 'owner'
+
+
+class UserSearchGram(db.Model):
+    # MySQL 默认排序规则忽略大小写和重音，不同的三元组会被视为相同而违反主键，因此使用二进制排序规则
+    gram = db.Column(
+        db.String(USER_SEARCH_GRAM_SIZE).with_variant(
+            mysql.VARCHAR(USER_SEARCH_GRAM_SIZE, charset='utf8mb4', collation='utf8mb4_bin'), 'mysql'
+        ),
+        primary_key=True
+    )
+    user_id = db.Column(db.Integer, primary_key=True, index=True)
+
+
+def user_search_grams(*values):
+    grams = set()
+    for value in values:
+        value = (value or '').lower()
+        for i in range(len(value) - USER_SEARCH_GRAM_SIZE + 1):
+            grams.add(value[i:i + USER_SEARCH_GRAM_SIZE])
+    return grams
+
+
+def user_search_index_grams(username, email):
+    # 只索引用户名和邮箱 @ 之前的部分；域名（gmail.com、qq.com 等）几乎人人相同，索引它只会产生巨大的倒排列表
+    return user_search_grams(username, (email or '').partition('@')[0])
+
+
+def index_user_search(connection, user_id, username, email):
+    connection.execute(UserSearchGram.__table__.delete().where(UserSearchGram.user_id == user_id))
+    grams = user_search_index_grams(username, email)
+    if grams:
+        connection.execute(UserSearchGram.__table__.insert(), [{'gram': g, 'user_id': user_id} for g in grams])
+
+
+@db.event.listens_for(User, 'after_insert')
+@db.event.listens_for(User, 'after_update')
+def _index_user_search(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.username.history.has_changes() or state.attrs.email.history.has_changes():
+        index_user_search(connection, target.id, target.username, target.email)
+
+
+@db.event.listens_for(User, 'before_delete')
+def _unindex_user_search(mapper, connection, target):
+    connection.execute(UserSearchGram.__table__.delete().where(UserSearchGram.user_id == target.id))
+
+
+def rebuild_user_search_index(batch_size=1000):
+    db.session.execute(UserSearchGram.__table__.delete())
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(User.id, User.username, User.email).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        values = [{'gram': g, 'user_id': row.id} for row in rows for g in user_search_index_grams(row.username, row.email)]
+        if values:
+            db.session.execute(UserSearchGram.__table__.insert(), values)
+        db.session.commit()
+        last_id = rows[-1].id
+    db.session.commit()
+
+
+def search_users(q, limit=USER_SEARCH_LIMIT):
+    q = q.strip()
+    if not q:
+        return []
+    q_lower = q.lower()
+    candidates = {}
+
+    for column in (User.uid, User.username, User.email):
+        for user in User.query.filter(column.startswith(q, autoescape=True)).order_by(column).limit(limit).all():
+            candidates[user.id] = user
+
+    # 子串匹配：索引只含用户名和邮箱本地部分，查询中 @ 之后的部分交给下面的 LIKE 精确过滤
+    grams = user_search_grams(q_lower.partition('@')[0])
+    if grams:
+        def postings(gram):
+            return db.select(UserSearchGram.user_id).where(UserSearchGram.gram == gram).limit(USER_SEARCH_SCAN_LIMIT)
+
+        # 每个三元组最多数 USER_SEARCH_SCAN_LIMIT 条，选出最少见的一个作为候选集合
+        rarest = min(grams, key=lambda g: db.session.scalar(
+            db.select(db.func.count()).select_from(postings(g).subquery())
+        ))
+        candidate_ids = db.session.execute(postings(rarest)).scalars().all()
+        if candidate_ids:
+            # 在数据库中精确匹配子串并按用户名长度排序，取到的是候选集合中的全局最优结果
+            for user in User.query.filter(
+                User.id.in_(candidate_ids),
+                db.or_(
+                    User.uid.contains(q_lower, autoescape=True),
+                    db.func.lower(User.username).contains(q_lower, autoescape=True),
+                    db.func.lower(User.email).contains(q_lower, autoescape=True)
+                )
+            ).order_by(db.func.length(User.username), User.username).limit(limit).all():
+                candidates[user.id] = user
+
+    def rank(user):
+        fields = [user.uid or '', (user.username or '').lower(), (user.email or '').lower()]
+        if q_lower in fields:
+            return (0, len(user.username or ''))
+        if any(f.startswith(q_lower) for f in fields):
+            return (1, len(user.username or ''))
+        return (2, len(user.username or ''))
+
+    results = [u for u in candidates.values()
+               if q_lower in (u.uid or '') or q_lower in (u.username or '').lower() or q_lower in (u.email or '').lower()]
+    results.sort(key=rank)
+    return results[:limit]
+
+
+def user_search_filter(q):
+    """与 search_users 匹配规则相同、但不限数量的 SQL 条件，供导出和批量操作覆盖全部匹配的用户。
+
+    三元组索引不含邮箱域名，候选集合也有上限，这里直接用 LIKE 匹配；导出和批量操作很少执行，可以接受全表扫描。
+    """
+    q_lower = q.strip().lower()
+    return db.or_(
+        User.uid.contains(q_lower, autoescape=True),
+        db.func.lower(User.username).contains(q_lower, autoescape=True),
+        db.func.lower(User.email).contains(q_lower, autoescape=True)
+    )
+
+
+class Domain(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    domain = db.Column(db.String(100), unique=True, nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    emails = db.relationship('RegisteredEmail', backref='domain_obj', lazy=True)
+
+
+class RegisteredEmail(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email_address = db.Column(db.String(100), unique=True, nullable=False)
+    email_password = db.Column(db.String(100), nullable=False)
+    prefix = db.Column(db.String(50), nullable=False)
+    domain_id = db.Column(db.Integer, db.ForeignKey('domain.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    is_disabled = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_registered_email_user_created', 'user_id', 'created_at'),
+        db.Index('ix_registered_email_domain_created', 'domain_id', 'created_at'),
+        db.Index('ix_registered_email_disabled_created', 'is_disabled', 'created_at'),
+    )
+
+
+class VerificationToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(100), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    token_type = db.Column(db.String(20), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+
+class Announcement(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SiteSettings(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    site_name = db.Column(db.String(100), default='邮箱注册系统')
+    site_description = db.Column(db.Text, default='免费邮箱注册服务')
+    site_url = db.Column(db.String(200), default='http://localhost:5000')
+    purchase_code_url = db.Column(db.String(500), default='')
+    tg_group_url = db.Column(db.String(500), default='')
+    default_user_max_emails = db.Column(db.Integer, default=2)
+    default_pro_max_emails = db.Column(db.Integer, default=5)
+    min_user_prefix_length = db.Column(db.Integer, default=7)
+    min_pro_prefix_length = db.Column(db.Integer, default=3)
+    smtp_server = db.Column(db.String(200), default='smtp.example.com')
+    imap_server = db.Column(db.String(200), default='imap.example.com')
+    pop3_server = db.Column(db.String(200), default='pop3.example.com')
+    webmail_url = db.Column(db.String(500), default='https://mail.example.com')
+
+
+class PrefixBlacklist(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    prefix = db.Column(db.String(100), unique=True, nullable=False)
+    match_type = db.Column(db.String(20), default='prefix', nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AllowedEmailSuffix(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    suffix = db.Column(db.String(100), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Ticket(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), default='open')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime)
+    last_reply_at = db.Column(db.DateTime)
+    reply_count = db.Column(db.Integer, default=0)
+    replies = db.relationship('TicketReply', backref='ticket', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_ticket_status_created', 'status', 'created_at'),
+        db.Index('ix_ticket_user_status_created', 'user_id', 'status', 'created_at'),
+    )
+
+
+class TicketReply(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user = db.relationship('User', backref='ticket_replies')
+
+    __table_args__ = (
+        db.Index('ix_ticket_reply_ticket_created', 'ticket_id', 'created_at'),
+    )
+
+
+class AboutPage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content = db.Column(db.Text, default='关于我们')
+
+
+class UserAgreement(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content = db.Column(db.Text, default='''
+## 用户协议
+
+欢迎使用本邮箱注册服务！
+
+### 重要声明
+
+本服务按"现状"提供，不保证服务的可靠性、可用性、持续性或安全性。使用本服务的风险由用户自行承担。
+
+### 免责声明
+
+1. 我们不对服务的中断、延迟、错误或数据丢失承担任何责任。
+2. 我们不保证服务能够满足您的特定需求。
+3. 因使用或无法使用本服务而产生的任何直接或间接损失，运营方不承担任何责任。
+4. 我们不对任何第三方内容或链接的准确性、完整性或可用性负责。
+
+### 数据安全
+
+我们尽力保护用户数据，但不保证数据的绝对安全。用户应自行承担数据丢失或泄露的风险。
+
+### 服务变更
+
+我们保留随时修改、暂停或终止服务的权利，无需提前通知，也不承担任何责任。
+
+### 使用条款
+
+- 用户不得利用本服务从事任何违法活动
+- 用户不得滥用或干扰本服务的正常运行
+- 我们保留随时终止违规用户账户的权利
+
+### 协议修改
+
+我们有权随时修改本协议。继续使用服务即表示同意修改后的协议。
+
+---
+
+**使用本服务即表示您已阅读、理解并同意本协议的所有条款。**
+''')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RedemptionCode(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(100), unique=True, nullable=False)
+    extra_emails = db.Column(db.Integer, default=1)
+    duration_days = db.Column(db.Integer)
+    is_permanent = db.Column(db.Boolean, default=False)
+    is_used = db.Column(db.Boolean, default=False)
+    max_uses = db.Column(db.Integer, default=1)
+    used_count = db.Column(db.Integer, default=0)
+    expires_at = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    used_at = db.Column(db.DateTime)
+    batch_id = db.Column(db.String(32), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_redemption_code_used_created', 'is_used', 'created_at'),
+        db.Index('ix_redemption_code_permanent_created', 'is_permanent', 'created_at'),
+        db.Index('ix_redemption_code_expires', 'expires_at'),
+    )
+
+    @staticmethod
+    def generate_code():
+        return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(16))
+    
+    def is_expired(self):
+        if self.expires_at and self.expires_at < datetime.utcnow():
+            return True
+        return False
+    
+    def can_be_used(self):
+        if self.is_expired():
+            return False
+        if self.max_uses > 0 and self.used_count >= self.max_uses:
+            return False
+        return True
+
+
+class CacheVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+
+class RateLimitBucket(db.Model):
+    key = db.Column(db.String(191), primary_key=True)
+    # 双精度：MySQL 的单精度 FLOAT 只能把时间戳精确到 128 秒，补充令牌的计算会严重失真
+    tokens = db.Column(db.Float(53), nullable=False)
+    updated_at = db.Column(db.Float(53), nullable=False)
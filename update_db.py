@@ -1,11 +1,144 @@
-from app import app, db
-from sqlalchemy import text
+from models import create_db_app, db, generate_uid, rebuild_user_search_index
+from sqlalchemy import text, inspect
+import os
+
+
+def ensure_indexes(conn):
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(conn)
+                conn.commit()
+                print(f"✓ 已创建索引 {index.name}")
+            except Exception as e:
+                print(f"  索引 {index.name} 创建跳过: {e}")
+
+
+def upgrade_legacy_schema():
+    """补齐早期版本缺少的列并为现有用户分配 uid。"""
+    try:
+        inspector = inspect(db.engine)
+        existing_tables = inspector.get_table_names()
+        
+        if 'user' in existing_tables:
+            columns = [col['name'] for col in inspector.get_columns('user')]
+            new_columns = ['uid', 'role', 'max_emails', 'extra_emails', 'pro_expires_at', 'is_permanent', 'temp_extra_emails', 'temp_expires_at']
+            for col in new_columns:
+                if col not in columns:
+                    try:
+                        with db.engine.connect() as conn:
+                            if col == 'uid':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN uid VARCHAR(20)"))
+                            elif col == 'role':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN role VARCHAR(20) DEFAULT 'user'"))
+                            elif col == 'max_emails':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN max_emails INT DEFAULT 2"))
+                            elif col == 'extra_emails':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN extra_emails INT DEFAULT 0"))
+                            elif col == 'pro_expires_at':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN pro_expires_at DATETIME"))
+                            elif col == 'is_permanent':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN is_permanent BOOLEAN DEFAULT FALSE"))
+                            elif col == 'temp_extra_emails':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN temp_extra_emails INT DEFAULT 0"))
+                            elif col == 'temp_expires_at':
+                                conn.execute(text("ALTER TABLE user ADD COLUMN temp_expires_at DATETIME"))
+                            conn.commit()
+                    except Exception as e:
+                        print(f"添加{col}列时出错: {e}")
+        
+        if 'site_settings' in existing_tables:
+            columns = [col['name'] for col in inspector.get_columns('site_settings')]
+            if 'site_url' not in columns:
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(text("ALTER TABLE site_settings ADD COLUMN site_url VARCHAR(200) DEFAULT 'http://localhost:5000'"))
+                        conn.commit()
+                except Exception as e:
+                    print(f"添加site_url列时出错: {e}")
+        
+        if 'redemption_code' in existing_tables:
+            columns = [col['name'] for col in inspector.get_columns('redemption_code')]
+            new_columns = ['max_uses', 'used_count', 'expires_at']
+            for col in new_columns:
+                if col not in columns:
+                    try:
+                        with db.engine.connect() as conn:
+                            if col == 'max_uses':
+                                conn.execute(text("ALTER TABLE redemption_code ADD COLUMN max_uses INT DEFAULT 1"))
+                            elif col == 'used_count':
+                                conn.execute(text("ALTER TABLE redemption_code ADD COLUMN used_count INT DEFAULT 0"))
+                            elif col == 'expires_at':
+                                conn.execute(text("ALTER TABLE redemption_code ADD COLUMN expires_at DATETIME"))
+                            conn.commit()
+                    except Exception as e:
+                        print(f"添加{col}列时出错: {e}")
+        
+        if 'site_settings' in existing_tables:
+            columns = [col['name'] for col in inspector.get_columns('site_settings')]
+            if 'purchase_code_url' not in columns:
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(text("ALTER TABLE site_settings ADD COLUMN purchase_code_url VARCHAR(500) DEFAULT ''"))
+                        conn.commit()
+                except Exception as e:
+                    print(f"添加purchase_code_url列时出错: {e}")
+        
+        if 'site_settings' in existing_tables:
+            columns = [col['name'] for col in inspector.get_columns('site_settings')]
+            if 'tg_group_url' not in columns:
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(text("ALTER TABLE site_settings ADD COLUMN tg_group_url VARCHAR(500) DEFAULT ''"))
+                        conn.commit()
+                except Exception as e:
+                    print(f"添加tg_group_url列时出错: {e}")
+        
+        db.create_all()
+        
+        if 'user' in existing_tables:
+            try:
+                with db.engine.connect() as conn:
+                    result = conn.execute(text("SELECT id, uid FROM user WHERE uid IS NULL OR uid = ''"))
+                    users_without_uid = result.fetchall()
+                    for user in users_without_uid:
+                        new_uid = generate_uid()
+                        conn.execute(text("UPDATE user SET uid = :uid WHERE id = :id"), {'uid': new_uid, 'id': user[0]})
+                    conn.commit()
+            except Exception as e:
+                print(f"为现有用户分配uid时出错: {e}")
+    
+    except Exception as e:
+        print(f"数据库迁移出错: {e}")
+
+    if not inspect(db.engine).has_table('user'):
+        return
+    admin_username = os.getenv('ADMIN_USERNAME', 'admin')
+    db.session.execute(
+        text("UPDATE user SET role = 'owner', is_admin = :yes WHERE username = :username AND role <> 'owner'"),
+        {'yes': True, 'username': admin_username}
+    )
+    db.session.commit()
+
 
 def update_database():
+    app = create_db_app()
     with app.app_context():
         print("正在检查并更新数据库...")
         
         try:
+            upgrade_legacy_schema()
+            
+            # 创建新版本新增的数据表
+            db.create_all()
+            print("✓ 数据表检查完成")
+            
             with db.engine.connect() as conn:
                 # 检查并添加 smtp_server 列
                 try:
@@ -13,7 +146,7 @@ def update_database():
                     print("✓ smtp_server 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE site_settings ADD COLUMN smtp_server VARCHAR(200) DEFAULT 'smtp.example.com'"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 smtp_server 列")
                 
                 # 检查并添加 imap_server 列
@@ -22,7 +155,7 @@ def update_database():
                     print("✓ imap_server 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE site_settings ADD COLUMN imap_server VARCHAR(200) DEFAULT 'imap.example.com'"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 imap_server 列")
                 
                 # 检查并添加 pop3_server 列
@@ -31,7 +164,7 @@ def update_database():
                     print("✓ pop3_server 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE site_settings ADD COLUMN pop3_server VARCHAR(200) DEFAULT 'pop3.example.com'"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 pop3_server 列")
                 
                 # 检查并添加 webmail_url 列
@@ -40,7 +173,7 @@ def update_database():
                     print("✓ webmail_url 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE site_settings ADD COLUMN webmail_url VARCHAR(500) DEFAULT 'https://mail.example.com'"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 webmail_url 列")
                 
                 # 检查并添加 nodeloc_id 列
@@ -49,7 +182,7 @@ def update_database():
                     print("✓ nodeloc_id 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE user ADD COLUMN nodeloc_id BIGINT UNIQUE"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 nodeloc_id 列")
                 
                 # 检查并添加 telegram_id 列
@@ -58,7 +191,7 @@ def update_database():
                     print("✓ telegram_id 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE user ADD COLUMN telegram_id BIGINT UNIQUE"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 telegram_id 列")
                 
                 # 检查并添加 google_id 列
@@ -67,8 +200,90 @@ def update_database():
                     print("✓ google_id 列已存在")
                 except:
                     conn.execute(text("ALTER TABLE user ADD COLUMN google_id VARCHAR(100) UNIQUE"))
-                    conn.execute(text("COMMIT"))
+                    conn.commit()
                     print("✓ 已添加 google_id 列")
+                
+                # 检查并添加前缀黑名单匹配方式列
+                try:
+                    conn.execute(text("SELECT match_type FROM prefix_blacklist LIMIT 1"))
+                    print("✓ match_type 列已存在")
+                except:
+                    conn.execute(text("ALTER TABLE prefix_blacklist ADD COLUMN match_type VARCHAR(20) NOT NULL DEFAULT 'prefix'"))
+                    conn.commit()
+                    print("✓ 已添加 match_type 列")
+                
+                # 检查并添加工单回复统计列
+                try:
+                    conn.execute(text("SELECT last_reply_at, reply_count FROM ticket LIMIT 1"))
+                    print("✓ 工单回复统计列已存在")
+                except:
+                    conn.execute(text("ALTER TABLE ticket ADD COLUMN last_reply_at DATETIME"))
+                    conn.execute(text("ALTER TABLE ticket ADD COLUMN reply_count INT DEFAULT 0"))
+                    conn.execute(text(
+                        "UPDATE ticket SET "
+                        "reply_count = (SELECT COUNT(*) FROM ticket_reply WHERE ticket_reply.ticket_id = ticket.id), "
+                        "last_reply_at = (SELECT MAX(created_at) FROM ticket_reply WHERE ticket_reply.ticket_id = ticket.id)"
+                    ))
+                    conn.commit()
+                    print("✓ 已添加工单回复统计列")
+                
+                # 检查并添加卡密批次列
+                try:
+                    conn.execute(text("SELECT batch_id FROM redemption_code LIMIT 1"))
+                    print("✓ batch_id 列已存在")
+                except:
+                    conn.execute(text("ALTER TABLE redemption_code ADD COLUMN batch_id VARCHAR(32)"))
+                    conn.commit()
+                    print("✓ 已添加 batch_id 列")
+                
+                # 检查并添加用户数据版本号列
+                try:
+                    conn.execute(text("SELECT data_version FROM user LIMIT 1"))
+                    print("✓ data_version 列已存在")
+                except:
+                    conn.execute(text("ALTER TABLE user ADD COLUMN data_version INT DEFAULT 0"))
+                    conn.commit()
+                    print("✓ 已添加 data_version 列")
+                
+                # 检查频率限制令牌桶的列精度，MySQL 须为双精度
+                if db.engine.dialect.name == 'mysql':
+                    column_types = dict(conn.execute(text(
+                        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'rate_limit_bucket'"
+                    )).all())
+                    if column_types and (column_types.get('tokens') != 'double' or column_types.get('updated_at') != 'double'):
+                        conn.execute(text("ALTER TABLE rate_limit_bucket MODIFY tokens DOUBLE NOT NULL, MODIFY updated_at DOUBLE NOT NULL"))
+                        conn.commit()
+                        print("✓ 已将 rate_limit_bucket 的令牌和时间列改为双精度")
+                    else:
+                        print("✓ rate_limit_bucket 列精度正确")
+                
+                # 检查用户搜索索引的排序规则，MySQL 须为二进制排序规则
+                rebuild_search_index = False
+                if db.engine.dialect.name == 'mysql':
+                    collation = conn.execute(text(
+                        "SELECT COLLATION_NAME FROM information_schema.COLUMNS "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_search_gram' AND COLUMN_NAME = 'gram'"
+                    )).scalar()
+                    if collation != 'utf8mb4_bin':
+                        conn.execute(text("DELETE FROM user_search_gram"))
+                        conn.execute(text("ALTER TABLE user_search_gram MODIFY gram VARCHAR(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL"))
+                        conn.commit()
+                        print("✓ 已将 user_search_gram.gram 改为 utf8mb4_bin 排序规则")
+                        rebuild_search_index = True
+                
+                # 检查并建立用户搜索索引；旧版索引包含邮箱域名（含 @ 的三元组），同样需要重建
+                if (rebuild_search_index
+                        or conn.execute(text("SELECT 1 FROM user_search_gram LIMIT 1")).first() is None
+                        or conn.execute(text("SELECT 1 FROM user_search_gram WHERE gram LIKE '%@%' LIMIT 1")).first() is not None):
+                    conn.commit()
+                    rebuild_user_search_index()
+                    print("✓ 已重建用户搜索索引")
+                else:
+                    print("✓ 用户搜索索引已存在")
+                
+                # 检查并创建列表查询所需的索引
+                ensure_indexes(conn)
             
             print("\n========================================")
             print("数据库更新完成！")
@@ -0,0 +1,9 @@
+"""生产环境 WSGI 入口。
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+也可作为 Flask 命令行入口：flask --app wsgi send-outbox
+"""
+from app import configure_app
+
+app = configure_app()